@@ -1,12 +1,12 @@
 import streamlit as st
-import pandas as pd
+import functools
 import json
 import os
+import threading
 from datetime import datetime
-from io import BytesIO
 
 # Import our modules
-from src import data_loaders, inventory_engine
+from src import data_loaders, export, forecasting, history, ingestion, inventory_engine, plan_view, upload_cache
 
 st.set_page_config(page_title="Master Inventory Planner", layout="wide", page_icon="📦")
 
@@ -16,13 +16,91 @@ try:
     with open("config/settings.json", "r") as f:
         config = json.load(f)
         defaults = config.get("defaults", {})
+        loader_opts = config.get("loaders", {})
+        paths = config.get("file_paths", {})
 except FileNotFoundError:
     defaults = {"sales_period_days": 30, "purchase_period_days": 15, "lead_time_days": 10, "safety_stock_days": 7}
+    loader_opts = {}
+    paths = {}
 
-sales_days = st.sidebar.number_input("Days of Sales Data Uploaded", min_value=1, value=defaults["sales_period_days"])
+cache_opts = {
+    "cache_dir": paths.get("cache_folder", upload_cache.DEFAULT_CACHE_DIR),
+    "max_mb": loader_opts.get("cache_max_mb", upload_cache.DEFAULT_MAX_MB)
+}
+
+@st.cache_data(show_spinner=False)
+def aggregate_demand_cached(amz_df, fk_df, meesho_df, master_df):
+    """Memoized merge/aggregate stage; sidebar changes only rerun the reorder math."""
+    return inventory_engine.aggregate_demand(amz_df, fk_df, meesho_df, master_df)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def plan_view_cached(plan_key, _plan_df):
+    """Gradient colours + group index, computed once per plan content."""
+    return plan_view.gradient_css(_plan_df["recommended_qty"]), plan_view.PlanIndex(_plan_df)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def build_export(plan_key, fmt, _plan_df, _orphans_df):
+    """Export bytes, keyed on the plan's content hash (the frames themselves are not re-hashed)."""
+    return export.render(fmt, _plan_df, _orphans_df)
+
+@st.cache_resource
+def history_connection(db_path):
+    """
+    One SQLite connection per history file for the whole server, with the lock
+    every session must hold while using it (so their transactions never interleave).
+    """
+    return history.connect(db_path), threading.Lock()
+
+@st.cache_data(show_spinner=False)
+def build_platform_daily_cached(amz_df, fk_df, meesho_df, master_df):
+    return inventory_engine.build_platform_daily(amz_df, fk_df, meesho_df, master_df)
+
+infer_window = st.sidebar.checkbox("Infer sales window from order dates", value=True)
+sales_days = st.sidebar.number_input("Days of Sales Data Uploaded", min_value=1, value=defaults["sales_period_days"],
+                                     help="Period the undated reports cover (Amazon Business Report); all uploads when order dates are not used.")
 purchase_days = st.sidebar.number_input("Days to Cover (Purchase Period)", min_value=1, value=defaults["purchase_period_days"])
 lead_time = st.sidebar.number_input("Supplier Lead Time (Days)", min_value=0, value=defaults["lead_time_days"])
-safety_stock = st.sidebar.number_input("Safety Stock Buffer (Days)", min_value=0, value=defaults["safety_stock_days"])
+forecast_options = {
+    "Flat average": None,
+    "Moving average (28 days)": "moving_average",
+    "Exponential smoothing": "ses",
+    "Holt (trend)": "holt",
+    "Croston (intermittent)": "croston",
+    "SBA (intermittent)": "sba"
+}
+forecast_label = st.sidebar.selectbox("Demand Forecast", list(forecast_options),
+                                      help="Forecasts need order dates (Flipkart / Meesho uploads).")
+forecast_method = forecast_options[forecast_label]
+safety_method = st.sidebar.radio("Safety Stock Method", ["Days of cover", "Service level"],
+                                 help="Service level uses the day-to-day variability of dated sales.")
+if safety_method == "Service level":
+    service_level = st.sidebar.slider("Target Service Level", min_value=0.80, max_value=0.999,
+                                      value=float(defaults.get("service_level", 0.95)), step=0.005, format="%.3f")
+    safety_stock = defaults["safety_stock_days"]  # fallback when uploads carry no dates
+else:
+    service_level = None
+    safety_stock = st.sidebar.number_input("Safety Stock Buffer (Days)", min_value=0, value=defaults["safety_stock_days"])
+
+watch_folder = paths.get("watch_folder", "")
+if watch_folder:
+    if st.sidebar.checkbox(f"Also read reports from `{watch_folder}/`", value=True):
+        st.sidebar.button("🔄 Rescan watch folder")  # any click reruns the script, which rescans
+    else:
+        watch_folder = ""
+
+# Optional sales history: uploads are kept (deduplicated by order ID) and the plan reads its window from the store
+history_db = paths.get("history_db", "")
+use_history = False
+if history_db:
+    use_history = st.sidebar.checkbox("Plan from sales history", value=False,
+                                      help=f"Uploads are saved to {history_db}; overlapping reports only add new orders.")
+    if use_history:
+        history_days = st.sidebar.number_input("History window (days)", min_value=1,
+                                               value=defaults.get("history_days", 90))
+        history_account = st.sidebar.text_input(
+            "Seller account", help="Names the account of uploaded Amazon Business Reports: a newer report of the "
+                                   "same account replaces the older one. Unnamed reports are all kept."
+        )
 
 st.sidebar.markdown("---")
 st.sidebar.info("💡 **Tip:** Update `config/master_product_list.csv` to change pack sizes or suppliers.")
@@ -36,87 +114,216 @@ col1, col2, col3 = st.columns(3)
 
 with col1:
     st.subheader("1. Amazon")
-    amz_file = st.file_uploader("CSV", type=["csv"], key="amz")
+    amz_files = st.file_uploader("CSV", type=["csv"], key="amz", accept_multiple_files=True)
 
 with col2:
     st.subheader("2. Flipkart")
-    fk_file = st.file_uploader("Excel", type=["xlsx"], key="fk")
+    fk_files = st.file_uploader("Excel", type=["xlsx"], key="fk", accept_multiple_files=True)
 
 with col3:
     st.subheader("3. Meesho")
-    meesho_file = st.file_uploader("CSV", type=["csv"], key="meesho")
+    meesho_files = st.file_uploader("CSV", type=["csv"], key="meesho", accept_multiple_files=True)
+
+bulk_files = st.file_uploader("…or drop any reports here (recognised from their header row)", type=["csv", "xlsx"],
+                              key="bulk", accept_multiple_files=True)
+
+# Optional stock file: recommendations become net of stock on hand / on order.
+# Falls back to file_paths.stock_file (e.g. a nightly export from the warehouse system).
+stock_file = st.file_uploader("4. Current Stock (optional)", type=["csv", "xlsx"], key="stock",
+                              help="Columns: SKU, stock qty and optionally an on-order / incoming qty.")
+
+# Optional folder watch: reports dropped into <folder>/ or <folder>/amazon|flipkart|meesho/ are picked up on every rerun
+sources = {"amazon": list(amz_files), "flipkart": list(fk_files), "meesho": list(meesho_files), None: list(bulk_files)}
+if watch_folder and os.path.isdir(watch_folder):
+    for platform, files in ingestion.folder_sources(watch_folder).items():
+        sources.setdefault(platform, []).extend(files)
+
+# Every file goes to the loader its header matches, whichever slot it was dropped in
+sources, route_errors = ingestion.route_sources(sources)
+for name, err in route_errors.items():
+    st.error(f"{name} — {err}")
+dropped_stock = sources.pop("stock", [])
+
+stock_path = paths.get("stock_file", "")
+stock_source = stock_file or (dropped_stock[0] if dropped_stock else None) \
+    or (stock_path if stock_path and os.path.exists(stock_path) else None)
 
 # Load Master Data
 master_path = "config/master_product_list.csv"
 if os.path.exists(master_path):
-    master_df, err = inventory_engine.load_master_data(master_path)
+    master_df, err = inventory_engine.load_master_index(master_path)
     if err:
         st.error(f"Error loading Master Data: {err}")
         st.stop()
     else:
         st.success(f"✅ Master Data Loaded: {len(master_df)} SKUs configured.")
+        duplicate_skus = inventory_engine.duplicate_master_skus(master_df)
+        if duplicate_skus:
+            st.warning(f"⚠️ {len(duplicate_skus)} marketplace SKU(s) listed more than once in the Master Data; "
+                       f"only the first row of each is used: {', '.join(duplicate_skus[:10])}")
 else:
     st.warning(f"⚠️ Master Data not found at {master_path}.")
     st.stop()
 
 # Process Data
-if amz_file or fk_file or meesho_file:
+history_conn, history_lock = history_connection(history_db) if use_history else (None, None)
+if history_conn is not None:
+    with history_lock:
+        history_empty = history.is_empty(history_conn)
+if any(sources.values()) or (history_conn is not None and not history_empty):
     st.markdown("---")
     with st.spinner("Merging Platforms & Calculating Demand..."):
-        # Load Files
-        amz_df = fk_df = meesho_df = None
+        loader_options = {
+            "amazon": {"max_memory_mb": loader_opts.get("amazon_max_memory_mb")},
+            "flipkart": {"engine": loader_opts.get("flipkart_engine", "openpyxl")}
+        }
+        load_fn = functools.partial(upload_cache.cached_load, **cache_opts)
         
-        if amz_file:
-            amz_df, err = data_loaders.load_amazon_sales(amz_file)
-            if err: st.error(err)
+        if history_conn is not None:
+            # New reports go into the store; demand comes from an indexed window query
+            # Undated summaries are stored as covering the typed sales days, then scaled to the window
+            with history_lock:
+                errors, new_lines = history.ingest_sources(history_conn, sources, load_fn=load_fn,
+                                                           options=loader_options, account=history_account,
+                                                           period_days=sales_days)
+                amz_df, fk_df, meesho_df = history.load_window(history_conn, days=history_days)
+                first, last = history.date_range(history_conn)
+            for name, err in errors.items():
+                st.error(f"{name} — {err}")
+            sales_days = history_days
+            if new_lines:
+                st.caption("🗄️ Saved to history: " + ", ".join(f"{name} +{n} lines" for name, n in new_lines.items()))
+            if last:
+                st.caption(f"🗄️ History holds {first} – {last}; planning on the last {history_days} days.")
+        else:
+            # Load Files: each report is parsed once per session and folded into the running demand
+            ledger = st.session_state.setdefault("demand_ledger", ingestion.DemandLedger())
+            errors, timings = ledger.sync(sources, options=loader_options, load_fn=load_fn)
+            for name, err in errors.items():
+                st.error(f"{name} — {err}")
             
-        if fk_file:
-            fk_df, err = data_loaders.load_flipkart_sales(fk_file)
-            if err: st.error(err)
-
-        if meesho_file:
-            meesho_df, err = data_loaders.load_meesho_sales(meesho_file)
-            if err: st.error(err)
-
-        # Run Calculation Engine (No Stock File needed now)
-        plan_df, orphans_df = inventory_engine.generate_purchase_plan(
-            amz_df, fk_df, meesho_df, master_df,
-            sales_days, purchase_days, lead_time, safety_stock
-        )
+            amz_df, fk_df, meesho_df = ledger.frames()
+            
+            duplicates = ledger.duplicate_lines()
+            st.caption(f"📂 {len(ledger.files)} report(s) merged."
+                       + (f" {duplicates:,} order line(s) already in an earlier report were skipped." if duplicates else ""))
+            if timings:
+                st.caption("⏱️ Parse time: " + ", ".join(f"{name} {t:.2f}s" for name, t in timings.items()))
+
+        stock_df = None
+        if stock_source is not None:
+            stock_df, err = upload_cache.cached_load(data_loaders.load_stock_levels, stock_source, **cache_opts)
+            if err:
+                st.error(err)
+            else:
+                stock_name = getattr(stock_source, "name", stock_source)
+                st.caption(f"📦 Net of stock from {stock_name} ({stock_df['internal_sku'].nunique()} SKUs).")
+
+        # Run Calculation Engine
+        demand_df, orphans_df = aggregate_demand_cached(amz_df, fk_df, meesho_df, master_df)
         
-        if not plan_df.empty:
-            # KPIs
-            kpi1, kpi2, kpi3 = st.columns(3)
-            total_units = plan_df["total_sold_units"].sum()
-            total_rec = plan_df["recommended_qty"].sum()
+        if not demand_df.empty:
+            # Daily series from real order dates (Meesho / Flipkart); ADS and trend come from it
+            platform_daily = build_platform_daily_cached(amz_df, fk_df, meesho_df, master_df) if infer_window else None
+            daily_stats = None
+            if platform_daily is not None:
+                daily = inventory_engine.combine_platform_daily(platform_daily)
+                daily_stats = inventory_engine.daily_demand_stats(daily, undated_days=sales_days)
+                if forecast_method:
+                    # Forecasts run on each platform's own days, not on the combined (filled) matrix
+                    daily_stats["ads"] = forecasting.forecast_ads(platform_daily, forecast_method, undated_days=sales_days)
+                # Each platform's ADS is over its own order dates; undated summaries over the typed period
+                spans = [
+                    f"{platform} {first:%d %b} – {last:%d %b %Y} ({(last - first).days + 1} days)"
+                    for df in (amz_df, fk_df, meesho_df)
+                    for platform, (first, last) in inventory_engine.order_date_spans(df).items()
+                ]
+                window = f"📅 Sales window from order dates: {', '.join(spans)}."
+                if daily[0]["undated_units"].any():
+                    window += f" Undated summaries (Amazon) over {sales_days} days."
+                st.caption(window)
+
+            plan_df = inventory_engine.apply_reorder_params(
+                demand_df, sales_days, purchase_days, lead_time, safety_stock,
+                daily_stats=daily_stats, service_level=service_level, stock=stock_df
+            )
+            if service_level and daily_stats is None:
+                st.info(f"No order dates in the uploads; using {safety_stock} days of safety stock instead of a service level.")
+            elif service_level:
+                fallback = int((plan_df["safety_basis"] == "Days of cover").sum())
+                if fallback:
+                    st.info(f"{fallback} SKU(s) have no dated sales (e.g. Amazon summary only); they use {safety_stock} "
+                            "days of safety stock instead of a service level (see the safety_basis column).")
+
+            plan_key = export.plan_hash(plan_df, orphans_df)
+            gradient, plan_index = plan_view_cached(plan_key, plan_df)
+            
+            # Platform + drill-down (category -> supplier or supplier -> category); each pick is a slice of the index
+            f0, f1, f2, f3 = st.columns(4)
+            selected_platform = f0.selectbox("Platform", ["All"] + plan_index.platforms)
+            platform = None if selected_platform == "All" else selected_platform
+            group_labels = {"Category": "category", "Supplier": "supplier"}
+            group_by = f1.radio("Group by", list(group_labels), horizontal=True)
+            head = group_labels[group_by]
+            sub_label = "Supplier" if head == "category" else "Category"
+            selected = f2.selectbox(f"Filter by {group_by}", ["All"] + plan_index.groups(head, platform=platform))
+            key = () if selected == "All" else (selected,)
+            if key:
+                selected_sub = f3.selectbox(f"Filter by {sub_label}", ["All"] + plan_index.groups(head, key, platform))
+                if selected_sub != "All":
+                    key += (selected_sub,)
             
-            kpi1.metric("Total Base Units Sold", f"{total_units:,.0f}")
-            kpi2.metric("Recommended Purchase Qty", f"{total_rec:,.0f}")
-            kpi3.metric("Unique Products", len(plan_df))
+            # KPIs (precomputed per group)
+            kpis = plan_index.kpis(head, key, platform)
+            kpi1, kpi2, kpi3 = st.columns(3)
+            if platform:
+                # Purchases can't be split by platform: the second tile stays whole-SKU and says so
+                kpi1.metric(f"Base Units Sold on {platform}", f"{kpis['total_sold_units']:,.0f}")
+                kpi2.metric("Recommended Purchase Qty (whole SKU, all platforms)", f"{kpis['recommended_qty']:,.0f}",
+                            help=f"Stock is bought per SKU, so this covers demand from every platform "
+                                 f"for the SKUs sold on {platform}.")
+            else:
+                kpi1.metric("Total Base Units Sold", f"{kpis['total_sold_units']:,.0f}")
+                kpi2.metric("Recommended Purchase Qty", f"{kpis['recommended_qty']:,.0f}")
+            kpi3.metric("Unique Products", f"{kpis['products']:,.0f}")
             
             # Display Table
-            st.subheader("📋 Purchase Recommendation")
-            cats = ["All"] + sorted(list(plan_df["category"].unique()))
-            selected_cat = st.selectbox("Filter by Category", cats)
+            scope = ((selected_platform,) if platform else ()) + key
+            st.subheader("📋 Purchase Recommendation" + (f" — {' / '.join(scope)}" if scope else ""))
+            positions = plan_index.positions(head, key, platform)
             
-            display_df = plan_df if selected_cat == "All" else plan_df[plan_df["category"] == selected_cat]
+            # Only the visible page is styled and sent to the browser
+            page_col1, page_col2 = st.columns([1, 3])
+            page_size = page_col1.selectbox("Rows per page", [50, 100, 250, 500], index=1)
+            n_pages = max(1, -(-len(positions) // page_size))
+            page = page_col2.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1)
+            start, stop = plan_view.page_bounds(len(positions), page, page_size)
+            page_positions = positions[start:stop]
             
             # Highlight high quantity rows
-            st.dataframe(display_df.style.background_gradient(subset=['recommended_qty'], cmap='Greens'), use_container_width=True)
-            
-            # Download Button
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                plan_df.to_excel(writer, index=False, sheet_name='Purchase Plan')
-                if not orphans_df.empty:
-                    orphans_df.to_excel(writer, index=False, sheet_name='Unknown SKUs')
-                
-            st.download_button(
-                label="📥 Download Purchase Plan (Excel)",
-                data=output.getvalue(),
-                file_name=f"Purchase_Plan_{datetime.now().strftime('%Y-%m-%d')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            st.dataframe(
+                plan_view.style_page(plan_df.iloc[page_positions], gradient[page_positions]),
+                use_container_width=True
             )
+            st.caption(f"Rows {start + 1:,}–{stop:,} of {len(positions):,}")
+            
+            # Download: built only when asked for, then cached per plan content + format
+            st.subheader("📥 Download")
+            format_labels = {"excel": "Excel (plan + unknown SKUs)", "csv": "CSV (plan only)", "parquet": "Parquet (plan only)"}
+            fmt = st.radio("Format", export.available_formats(), format_func=format_labels.get, horizontal=True)
+            prepared = st.session_state.setdefault("prepared_exports", set())
+            
+            if (plan_key, fmt) not in prepared and st.button("Prepare download"):
+                prepared.add((plan_key, fmt))
+            
+            if (plan_key, fmt) in prepared:
+                data, ext, mime = build_export(plan_key, fmt, plan_df, orphans_df)
+                st.download_button(
+                    label=f"📥 Download Purchase Plan ({ext.upper()})",
+                    data=data,
+                    file_name=f"Purchase_Plan_{datetime.now().strftime('%Y-%m-%d')}.{ext}",
+                    mime=mime
+                )
             
             # Orphan Warning
             if not orphans_df.empty:
@@ -0,0 +1,213 @@
+"""
+Parameter backtest: replays dated sales through the planner and scores each
+combination of sales window, purchase period, lead time and safety days.
+
+    python -m src.backtest --reports downloads/* --lead-time 7 10 14 --safety-days 3 7
+    python -m src.backtest --flipkart Orders.xlsx --meesho Orders.csv --out backtest.csv
+
+Value lists default to config/settings.json: the "backtest" section if present,
+else the single planner defaults. Only dated reports (Flipkart / Meesho) can be
+replayed; undated period summaries (Amazon Business Report) are left out.
+"""
+import argparse
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import inventory_engine
+
+# Worker-side copy of the daily demand (set once per process by _init_worker)
+_worker_state = {}
+
+def parameter_grid(sales_days, purchase_days, lead_time, safety_stock_days):
+    """Every combination of the given value lists, as a list of dicts."""
+    return [
+        {"sales_days": s, "purchase_days": p, "lead_time": l, "safety_stock_days": ss}
+        for s, p, l, ss in itertools.product(sales_days, purchase_days, lead_time, safety_stock_days)
+    ]
+
+def _init_worker(series):
+    # Cumulative sums turn any window total into two column lookups; shared by all combos
+    for platform, (keys, matrix) in series.items():
+        _worker_state[platform] = (
+            keys[inventory_engine.GROUP_COLS],
+            np.concatenate([np.zeros((matrix.shape[0], 1)), matrix.cumsum(axis=1)], axis=1)
+        )
+
+def _window_total(cumsum, start, end):
+    return cumsum[:, end] - cumsum[:, start]
+
+def _score_group(platform, sales_days, combos, step_days):
+    """
+    Scores combos that share one sales window length on one platform's series.
+    The demand table for each cutoff is built once and reused for every combo in the group.
+    """
+    keys, cumsum = _worker_state[platform]
+    n_days = cumsum.shape[1] - 1
+    longest_horizon = max(c["lead_time"] + c["purchase_days"] for c in combos)
+    cutoffs = range(sales_days, n_days - longest_horizon + 1, step_days)
+
+    totals = {c: 0.0 for c in ("stockout_units", "overstock_units", "actual_units", "stockout_skus", "sku_windows")}
+    results = [dict(combo, windows=0, **totals) for combo in combos]
+
+    for cutoff in cutoffs:
+        demand = keys.copy()
+        demand["total_sold_units"] = _window_total(cumsum, cutoff - sales_days, cutoff)
+        demand["sku_count"] = 1
+        active = demand["total_sold_units"].to_numpy() > 0
+
+        for combo, result in zip(combos, results):
+            plan = inventory_engine.apply_reorder_params(
+                demand, sales_days, combo["purchase_days"], combo["lead_time"], combo["safety_stock_days"]
+            )
+            recommended = plan["recommended_qty"].sort_index().to_numpy()
+
+            # What actually sold while the order was in transit + the period it was bought for
+            horizon = combo["lead_time"] + combo["purchase_days"]
+            actual = _window_total(cumsum, cutoff, cutoff + horizon)
+
+            shortfall = np.clip(actual - recommended, 0, None)
+            result["windows"] += 1
+            result["stockout_units"] += shortfall.sum()
+            result["overstock_units"] += np.clip(recommended - actual, 0, None).sum()
+            result["actual_units"] += actual.sum()
+            result["stockout_skus"] += (shortfall > 0)[active].sum()
+            result["sku_windows"] += active.sum()
+
+    return results
+
+def _dated_series(amazon_df, flipkart_df, meesho_df, master_df):
+    """
+    {platform: (keys, matrix)} for every platform with order dates, each over its
+    own first..last order date, so no platform is replayed over days it has no data for.
+    """
+    platform_daily = inventory_engine.build_platform_daily(amazon_df, flipkart_df, meesho_df, master_df)
+    if platform_daily is None:
+        return {}
+    keys, series = platform_daily
+    return {platform: (keys, matrix) for platform, (_, matrix) in series.items()}
+
+def run_backtest(amazon_df, flipkart_df, meesho_df, master_df, grid, step_days=7, max_workers=None):
+    """
+    Replays dated sales through the planner over rolling windows and scores
+    each parameter combination.
+
+    At every cutoff (every step_days), the plan is built from the previous
+    sales_days of history and compared with what actually sold over the next
+    lead_time + purchase_days. Stockout units are demand the recommendation
+    didn't cover; overstock units are recommended units that didn't sell.
+    Each dated platform is replayed over its own order-date span and the scores
+    are summed; undated period summaries have no daily history and are left out.
+    Combinations are spread over a process pool, grouped so that combos
+    sharing a sales window reuse the same per-cutoff demand table.
+
+    Returns a DataFrame with one row per combination, best fill rate first,
+    or None if the uploads carry no order dates.
+    """
+    series = _dated_series(amazon_df, flipkart_df, meesho_df, master_df)
+    if not series:
+        return None
+
+    by_window = {}
+    for combo in grid:
+        by_window.setdefault(combo["sales_days"], []).append(combo)
+
+    # Split each window group into roughly one chunk per worker
+    workers = max_workers or os.cpu_count() or 1
+    tasks = []
+    for platform in series:
+        for sales_days, combos in by_window.items():
+            chunk = max(1, -(-len(combos) // workers))
+            for i in range(0, len(combos), chunk):
+                tasks.append((platform, sales_days, combos[i:i + chunk]))
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(series,)) as executor:
+        futures = [executor.submit(_score_group, *task, step_days) for task in tasks]
+        for future in futures:
+            rows.extend(future.result())
+
+    params = ["sales_days", "purchase_days", "lead_time", "safety_stock_days"]
+    results = pd.DataFrame(rows).groupby(params, as_index=False, sort=False).sum()
+    results = results[results["windows"] > 0]
+    if results.empty:
+        return results
+
+    results["fill_rate"] = 1 - results["stockout_units"] / results["actual_units"].where(results["actual_units"] > 0)
+    results["stockout_sku_rate"] = results["stockout_skus"] / results["sku_windows"].where(results["sku_windows"] > 0)
+    results["overstock_per_window"] = results["overstock_units"] / results["windows"]
+    results = results.drop(columns=["stockout_skus", "sku_windows"])
+    return results.sort_values(["fill_rate", "overstock_units"], ascending=[False, True]).reset_index(drop=True)
+
+def parse_args(argv, defaults, grid_defaults):
+    def values(key, default_key, fallback):
+        return grid_defaults.get(key) or [defaults.get(default_key, fallback)]
+
+    parser = argparse.ArgumentParser(prog="python -m src.backtest", description="Score planner parameters against past sales.")
+    parser.add_argument("--config", default="config/settings.json", help="Settings file (default: %(default)s)")
+    parser.add_argument("--amazon", nargs="+", default=[], metavar="CSV", help="Amazon Business Report(s) (undated, not replayed)")
+    parser.add_argument("--flipkart", nargs="+", default=[], metavar="XLSX", help="Flipkart Orders export(s)")
+    parser.add_argument("--meesho", nargs="+", default=[], metavar="CSV", help="Meesho Orders report(s)")
+    parser.add_argument("--reports", nargs="+", default=[], metavar="FILE",
+                        help="Reports of any platform, recognised from their header row")
+    parser.add_argument("--sales-days", nargs="+", type=int, default=values("sales_days", "sales_period_days", 30))
+    parser.add_argument("--purchase-days", nargs="+", type=int, default=values("purchase_days", "purchase_period_days", 15))
+    parser.add_argument("--lead-time", nargs="+", type=int, default=values("lead_time", "lead_time_days", 10))
+    parser.add_argument("--safety-days", nargs="+", type=int, default=values("safety_stock_days", "safety_stock_days", 7))
+    parser.add_argument("--step-days", type=int, default=grid_defaults.get("step_days", 7), help="Days between cutoffs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--out", help="Write the results to this CSV as well")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from .plan import PLATFORMS, load_settings
+
+    argv = sys.argv[1:] if argv is None else argv
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--config", default="config/settings.json")
+    config = load_settings(pre.parse_known_args(argv)[0].config)
+    args = parse_args(argv, config.get("defaults", {}), config.get("backtest", {}))
+
+    sources = {"amazon": args.amazon, "flipkart": args.flipkart, "meesho": args.meesho, None: args.reports}
+    if not any(sources.values()):
+        print("No reports given. Pass --amazon/--flipkart/--meesho/--reports.", file=sys.stderr)
+        return 2
+
+    from . import ingestion
+    paths = config.get("file_paths", {})
+    master_df, err = inventory_engine.load_master_index(paths.get("master_data", "config/master_product_list.csv"))
+    if err:
+        print(f"Error loading Master Data: {err}", file=sys.stderr)
+        return 1
+
+    sources, errors = ingestion.route_sources(sources)
+    sources.pop("stock", None)
+    ledger = ingestion.DemandLedger()
+    sync_errors, _ = ledger.sync({p: sources.get(p, []) for p in PLATFORMS})
+    errors.update(sync_errors)
+    for file_name, file_err in errors.items():
+        print(f"{file_name}: {file_err}", file=sys.stderr)
+
+    grid = parameter_grid(args.sales_days, args.purchase_days, args.lead_time, args.safety_days)
+    results = run_backtest(*ledger.frames(), master_df, grid, step_days=args.step_days, max_workers=args.workers)
+    if results is None:
+        print("No order dates in the reports; nothing to replay.", file=sys.stderr)
+        return 1
+    if results.empty:
+        print("Not enough dated history for any combination (need sales_days + lead_time + purchase_days days).",
+              file=sys.stderr)
+        return 1
+
+    print(results.to_string(index=False, float_format=lambda x: f"{x:,.3f}"))
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        results.to_csv(args.out, index=False)
+        print(f"-> {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
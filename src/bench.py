@@ -0,0 +1,263 @@
+"""
+Benchmarks for the vectorized planner paths, each with a parity check against
+the row-at-a-time code it replaced.
+
+    python -m src.bench                         # every benchmark
+    python -m src.bench skus --rows 500000      # just one
+    python -m src.bench skus --data downloads
+    python -m src.bench aggregate --rows 2000000
+    python -m src.bench forecast --skus 50000 --days 365
+
+Sample reports (default: data/) are recognised from their header row. Timings
+are the best of --repeat runs. Exits non-zero if any parity check fails.
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import data_loaders, forecasting, inventory_engine, schemas
+
+def best_of(fn, repeat):
+    """(result of the last run, fastest wall time in seconds)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def report(label, reference_s, fast_s, rows):
+    print(f"  {label}: {reference_s * 1000:,.1f} ms -> {fast_s * 1000:,.1f} ms "
+          f"({reference_s / fast_s:,.1f}x, {rows:,} rows)")
+
+def sample_reports(folder):
+    """{report kind: [paths]} for the files in folder, sniffed like the bulk uploader."""
+    found = {}
+    for path in sorted(glob.glob(os.path.join(folder, "*"))):
+        kind = schemas.sniff_report(path) if os.path.isfile(path) else None
+        if kind:
+            found.setdefault(kind, []).append(path)
+    return found
+
+# --- SKU normalization (data_loaders.normalize_skus / extract_flipkart_skus) ---
+
+def _extract_flipkart_sku(raw_val):
+    # Per-row original the vectorized extract replaced. The original turned a blank
+    # cell into "NAN"; blanks now pass through to clean_sku's "UNKNOWN" like the
+    # other platforms, so that one intended difference is not counted as a mismatch.
+    if pd.isna(raw_val):
+        return raw_val
+    raw_val = str(raw_val)
+    match = re.search(data_loaders.FLIPKART_SKU_PATTERN, raw_val)
+    if match:
+        return match.group(1)
+    return raw_val
+
+def _raw_skus(path, kind):
+    if kind == "flipkart":
+        df, _ = schemas.read_xlsx_report(path, kind)
+    else:
+        df, _ = schemas.read_csv_report(path, kind)
+    return df["sku"]
+
+def bench_skus(args):
+    """normalize_skus (+ extract_flipkart_skus) vs apply(clean_sku) on the sample reports."""
+    failures = 0
+    columns = []
+    for kind, paths in sample_reports(args.data).items():
+        if kind not in ("amazon", "flipkart", "meesho"):
+            continue
+        for path in paths:
+            raw = _raw_skus(path, kind)
+            columns.append((kind, raw))
+            if kind == "flipkart":
+                expected = raw.map(_extract_flipkart_sku).map(data_loaders.clean_sku)
+                got = data_loaders.normalize_skus(data_loaders.extract_flipkart_skus(raw))
+            else:
+                expected = raw.map(data_loaders.clean_sku)
+                got = data_loaders.normalize_skus(raw)
+            same = expected.tolist() == got.tolist()
+            failures += not same
+            print(f"  parity {os.path.basename(path)} ({kind}, {len(raw):,} SKUs): {'ok' if same else 'MISMATCH'}")
+    if not columns:
+        print(f"  no sample reports found in {args.data}")
+        return failures
+
+    # Timing: the sample SKUs tiled up to --rows, with some blanks and padding mixed in
+    rng = np.random.default_rng(0)
+    for kind in ("amazon", "flipkart"):
+        pool = pd.concat([raw for k, raw in columns if (k == "flipkart") == (kind == "flipkart")], ignore_index=True)
+        if pool.empty:
+            continue
+        skus = pool.iloc[rng.integers(0, len(pool), args.rows)].reset_index(drop=True)
+        skus = skus.where(rng.random(args.rows) > 0.01)
+        skus = skus.mask(rng.random(args.rows) < 0.05, " " + skus.fillna("") + " ")
+        if kind == "flipkart":
+            expected, slow = best_of(lambda: skus.map(_extract_flipkart_sku).map(data_loaders.clean_sku), args.repeat)
+            got, fast = best_of(lambda: data_loaders.normalize_skus(data_loaders.extract_flipkart_skus(skus)), args.repeat)
+        else:
+            expected, slow = best_of(lambda: skus.map(data_loaders.clean_sku), args.repeat)
+            got, fast = best_of(lambda: data_loaders.normalize_skus(skus), args.repeat)
+        same = expected.tolist() == got.tolist()
+        failures += not same
+        report(f"{'flipkart extract + ' if kind == 'flipkart' else ''}normalize{'' if same else ' (MISMATCH)'}",
+               slow, fast, args.rows)
+    return failures
+
+# --- Demand aggregation (inventory_engine.aggregate_demand engines) ---
+
+def synthetic_sales(master_df, rows, seed=0, unknown_share=0.05):
+    """
+    (amazon_df, flipkart_df, meesho_df) with `rows` order lines in total, drawn
+    from the master's marketplace SKUs plus a share of SKUs missing from it.
+    """
+    rng = np.random.default_rng(seed)
+    known = master_df["marketplace_sku"].map(data_loaders.clean_sku).unique()
+    unknown = np.array([f"UNKNOWN-SKU-{i}" for i in range(max(1, len(known) // 10))])
+    pick_unknown = rng.random(rows) < unknown_share
+    skus = np.where(pick_unknown, unknown[rng.integers(0, len(unknown), rows)], known[rng.integers(0, len(known), rows)])
+    qty = rng.integers(1, 4, rows).astype(float)
+    platform = rng.integers(0, 3, rows)
+
+    frames = []
+    for i, name in enumerate(inventory_engine.PLATFORMS):
+        mask = platform == i
+        frames.append(pd.DataFrame({"sku": skus[mask], "qty": qty[mask], "platform": name}))
+    return tuple(frames)
+
+def _sorted(df):
+    return df.sort_values(inventory_engine.GROUP_COLS).reset_index(drop=True)
+
+def bench_aggregate(args):
+    """aggregate_demand: integer-coded join/groupby vs the string merge/groupby on synthetic order lines."""
+    master_df, err = inventory_engine.load_master_data(args.master)
+    if err:
+        print(f"  {err}")
+        return 1
+    duplicate_skus = inventory_engine.duplicate_master_skus(master_df)
+    if duplicate_skus:
+        # The string merge counts these once per master row, the codes engine once
+        print(f"  note: {len(duplicate_skus)} duplicate marketplace SKU(s) in the master; expect a mismatch on them")
+    frames = synthetic_sales(master_df, args.rows)
+
+    (expected, expected_orphans), slow = best_of(
+        lambda: inventory_engine.aggregate_demand(*frames, master_df, engine="strings", preaggregate=False), args.repeat)
+    failures = 0
+    for label, kwargs in (("codes", {"preaggregate": False}), ("codes + preaggregate", {"preaggregate": True})):
+        (got, got_orphans), fast = best_of(
+            lambda: inventory_engine.aggregate_demand(*frames, master_df, engine="codes", **kwargs), args.repeat)
+        try:
+            pd.testing.assert_frame_equal(_sorted(got), _sorted(expected), check_dtype=False)
+            pd.testing.assert_frame_equal(
+                got_orphans.sort_values(["sku", "platform"]).reset_index(drop=True),
+                expected_orphans.sort_values(["sku", "platform"]).reset_index(drop=True), check_dtype=False)
+            same = True
+        except AssertionError as e:
+            print(f"  {label} differs from the string engine: {str(e).splitlines()[0]}")
+            same = False
+        failures += not same
+        report(f"strings -> {label}{'' if same else ' (MISMATCH)'}", slow, fast, args.rows)
+    return failures
+
+# --- Forecasting (forecasting.METHODS over the whole SKU x day matrix) ---
+
+def synthetic_daily(n_skus, n_days, seed=0):
+    """A build_platform_daily-shaped result (one platform): mostly intermittent demand, some steady sellers."""
+    rng = np.random.default_rng(seed)
+    rate = rng.gamma(0.5, 2.0, n_skus)[:, None]
+    sells = rng.random((n_skus, n_days)) < np.clip(rate / 4, 0.02, 0.9)
+    matrix = np.where(sells, rng.poisson(rate + 1), 0).astype(float)
+    keys = pd.DataFrame({
+        "internal_sku": [f"SKU-{i}" for i in range(n_skus)],
+        "undated_units": np.zeros(n_skus)
+    })
+    return keys, {"Meesho": (pd.date_range("2025-01-01", periods=n_days, freq="D"), matrix)}
+
+def _reference_forecast(method, series):
+    """The same recursions for one SKU's daily series, one day at a time in Python."""
+    first = sum(series[:forecasting.INIT_DAYS]) / len(series[:forecasting.INIT_DAYS])
+    if method == "moving_average":
+        window = series[-28:]
+        return sum(window) / len(window)
+    if method == "ses":
+        level = first
+        for demand in series:
+            level += 0.2 * (demand - level)
+        return level
+    if method == "holt":
+        level, trend = first, 0.0
+        for demand in series:
+            prev_level = level
+            level = 0.2 * demand + 0.8 * (level + trend)
+            trend = 0.1 * (level - prev_level) + 0.9 * trend
+        return max(level + trend, 0.0)
+    # croston / sba
+    hits = [d for d in series if d > 0]
+    if not hits:
+        return 0.0
+    size, interval, since_last = sum(hits) / len(hits), len(series) / len(hits), 0
+    for demand in series:
+        since_last += 1
+        if demand > 0:
+            size += 0.1 * (demand - size)
+            interval += 0.1 * (since_last - interval)
+            since_last = 0
+    rate = size / interval
+    return rate * (1 - 0.1 / 2) if method == "sba" else rate
+
+def bench_forecast(args):
+    """forecast_ads for every method on a SKU x day matrix vs a per-SKU Python loop."""
+    daily = synthetic_daily(args.skus, args.days)
+    _, matrix = daily[1]["Meesho"]
+    check = min(args.check_skus, args.skus)
+    failures = 0
+    for method in forecasting.METHODS:
+        # Includes forecast_ads' day-major copy of the matrix
+        got, fast = best_of(lambda: forecasting.forecast_ads(daily, method), args.repeat)
+        rows = [matrix[i].tolist() for i in range(check)]
+        expected, slow = best_of(lambda: np.array([_reference_forecast(method, r) for r in rows]), 1)
+        same = np.allclose(got[:check], expected)
+        failures += not same
+        # The loop runs on the first `check` SKUs only; scale it up for the comparison
+        slow_all = slow * args.skus / check
+        print(f"  {method}: {fast * 1000:,.1f} ms for {args.skus:,} SKUs x {args.days} days; "
+              f"per-SKU loop ~{slow_all * 1000:,.0f} ms ({slow_all / fast:,.1f}x); "
+              f"parity on {check:,} SKUs: {'ok' if same else 'MISMATCH'}")
+    return failures
+
+BENCHMARKS = {
+    "skus": bench_skus,
+    "aggregate": bench_aggregate,
+    "forecast": bench_forecast
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.bench", description="Time the vectorized planner paths and check parity.")
+    parser.add_argument("names", nargs="*", metavar="NAME",
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--data", default="data", help="Folder with sample reports (default: %(default)s)")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic rows for the SKU and aggregation benchmarks")
+    parser.add_argument("--master", default="config/master_product_list.csv", help="Master list (default: %(default)s)")
+    parser.add_argument("--skus", type=int, default=50_000, help="SKUs in the forecasting matrix")
+    parser.add_argument("--days", type=int, default=365, help="Days in the forecasting matrix")
+    parser.add_argument("--check-skus", type=int, default=500, help="SKUs re-run through the per-SKU reference loop")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per timing; the fastest is reported")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    failures = 0
+    for name in args.names or list(BENCHMARKS):
+        print(f"{name}: {BENCHMARKS[name].__doc__}")
+        failures += BENCHMARKS[name](args)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,68 +1,129 @@
 import pandas as pd
-import re
+import time
 from datetime import datetime
 
+from . import schemas
+
+# Bump whenever a loader's output changes, so cached parses are not reused
+LOADER_VERSION = "6"
+
+# Columns every sales loader returns (order_id is None where the report has no order lines)
+SALES_COLUMNS = ["sku", "qty", "platform", "date", "order_id"]
+
+# Columns load_stock_levels returns
+STOCK_COLUMNS = ["internal_sku", "stock_on_hand", "on_order"]
+
+def parse_order_dates(values):
+    """
+    Order timestamps -> calendar day (NaT when missing or unparseable).
+    Plain numbers in a plausible range (1954-2119) are taken as Excel serial days,
+    which is how a date-typed cell comes through when its style isn't a date format.
+    """
+    if values is None:
+        return pd.NaT
+    serials = pd.to_numeric(values, errors='coerce')
+    serials = serials.where(serials.between(20000, 80000))
+    dates = pd.to_datetime(values.where(serials.isna()), errors='coerce')
+    if serials.notna().any():
+        dates = dates.fillna(pd.to_datetime(serials, unit="D", origin="1899-12-30"))
+    return dates.dt.normalize()
+
 def clean_sku(sku):
     """Standardizes SKU format: Uppercase, stripped of whitespace."""
     if pd.isna(sku):
         return "UNKNOWN"
     return str(sku).strip().upper()
 
-def load_amazon_sales(uploaded_file):
-    """Parses Amazon Business Report CSV."""
+def normalize_skus(series):
+    """Vectorized clean_sku over a whole column (NaN -> 'UNKNOWN')."""
+    missing = series.isna()
+    cleaned = series.astype(str).str.strip().str.upper()
+    return cleaned.mask(missing, "UNKNOWN")
+
+# Flipkart wraps the seller SKU as '"""SKU:XYZ"""'
+FLIPKART_SKU_PATTERN = r'SKU:([^"]+)'
+
+def extract_flipkart_skus(series):
+    """Pulls the seller SKU out of Flipkart's quoted 'SKU:...' cells; other values pass through."""
+    raw = series.astype(str)
+    extracted = raw.str.extract(FLIPKART_SKU_PATTERN, expand=False).fillna(raw)
+    return extracted.mask(series.isna())
+
+# Rough in-memory cost of one (sku, qty) row while a chunk is being parsed.
+AMAZON_ROW_BYTES = 200
+
+def load_amazon_sales(uploaded_file, max_memory_mb=None):
+    """Parses Amazon Business Report CSV.
+
+    Only the SKU / Units Ordered columns are read (see schemas.SCHEMAS). If
+    max_memory_mb is set, the report is streamed in chunks sized to stay under
+    that budget.
+    """
+    if max_memory_mb:
+        return _load_amazon_sales_chunked(uploaded_file, max_memory_mb)
     try:
-        df = pd.read_csv(uploaded_file)
-        
-        df.columns = [c.strip() for c in df.columns]
-        
-        col_map = {
-            "SKU": "sku",
-            "Units Ordered": "qty",
-            "(Child) ASIN": "asin",
-            "Title": "title"
-        }
-        df = df.rename(columns=col_map)
-        
-        if "sku" not in df.columns or "qty" not in df.columns:
-            return None, "Amazon file missing 'SKU' or 'Units Ordered' columns."
+        df, _ = schemas.read_csv_report(uploaded_file, "amazon")
 
-        df["sku"] = df["sku"].apply(clean_sku)
-        df["qty"] = pd.to_numeric(df["qty"].astype(str).str.replace(",", ""), errors='coerce').fillna(0)
+        df["sku"] = normalize_skus(df["sku"])
+        df["qty"] = pd.to_numeric(df["qty"].str.replace(",", ""), errors='coerce').fillna(0)
         
         df["platform"] = "Amazon"
-        return df[["sku", "qty", "platform"]], None
+        # The Business Report is a period summary: no per-order dates or order IDs
+        df["date"] = pd.NaT
+        df["order_id"] = None
+        return df[SALES_COLUMNS], None
         
     except Exception as e:
         return None, f"Error reading Amazon file: {str(e)}"
 
-def load_flipkart_sales(uploaded_file):
-    """Parses Flipkart Orders Excel."""
+def _load_amazon_sales_chunked(uploaded_file, max_memory_mb):
+    """Streams the Amazon report chunk by chunk, summing qty per SKU as it goes."""
     try:
-        df = pd.read_excel(uploaded_file, sheet_name="Orders", engine="openpyxl")
-        df.columns = [c.strip() for c in df.columns]
-        
-        col_map = {
-            "sku": "sku",
-            "quantity": "qty",
-            "order_item_status": "status"
-        }
-        df = df.rename(columns=col_map)
+        chunk_rows = max(1000, int(max_memory_mb * 1024 * 1024 / AMAZON_ROW_BYTES))
+        reader, _ = schemas.read_csv_report(uploaded_file, "amazon", chunksize=chunk_rows)
+
+        partials = []
+        for chunk in reader:
+            chunk["sku"] = normalize_skus(chunk["sku"])
+            chunk["qty"] = pd.to_numeric(chunk["qty"].str.replace(",", ""), errors='coerce').fillna(0)
+            partials.append(chunk.groupby("sku", sort=False)["qty"].sum())
+
+        if partials:
+            # SKUs can repeat across chunks (and across stacked reports), so fold the partial sums once more
+            qty = pd.concat(partials).groupby(level=0, sort=False).sum()
+        else:
+            qty = pd.Series(dtype=float)
+
+        df = qty.rename("qty").rename_axis("sku").reset_index()
+        df["platform"] = "Amazon"
+        # The Business Report is a period summary: no per-order dates or order IDs
+        df["date"] = pd.NaT
+        df["order_id"] = None
+        return df[SALES_COLUMNS], None
+
+    except Exception as e:
+        return None, f"Error reading Amazon file: {str(e)}"
+
+def load_flipkart_sales(uploaded_file, engine="openpyxl"):
+    """
+    Parses Flipkart Orders Excel.
 
-        def extract_flipkart_sku(raw_val):
-            raw_val = str(raw_val)
-            match = re.search(r'SKU:([^"]+)', raw_val)
-            if match:
-                return match.group(1)
-            return raw_val
+    engine="stream" skips openpyxl and pulls the mapped columns straight out of
+    the Orders sheet XML (see xlsx_reader).
+    """
+    try:
+        df, _ = schemas.read_xlsx_report(uploaded_file, "flipkart", engine=engine)
 
-        df["sku"] = df["sku"].apply(extract_flipkart_sku).apply(clean_sku)
+        df["sku"] = normalize_skus(extract_flipkart_skus(df["sku"]))
         df["qty"] = pd.to_numeric(df["qty"], errors='coerce').fillna(0)
         
         valid_statuses = ["DELIVERED", "SHIPPED", "APPROVED", "PACKED"]
         df = df[df["status"].isin(valid_statuses)]
         
         df["platform"] = "Flipkart"
-        return df[["sku", "qty", "platform"]], None
+        df["date"] = parse_order_dates(df.get("date"))
+        df["order_id"] = df.get("order_id")
+        return df[SALES_COLUMNS], None
 
     except Exception as e:
         return None, f"Error reading Flipkart file: {str(e)}"
@@ -70,54 +131,112 @@ def load_flipkart_sales(uploaded_file):
 def load_meesho_sales(uploaded_file):
     """Parses Meesho Orders CSV."""
     try:
-        df = pd.read_csv(uploaded_file)
-        df.columns = [c.strip() for c in df.columns]
-        
-        # Mapping based on your file structure
-        col_map = {
-            "SKU": "sku",
-            "Quantity": "qty",
-            "Reason for Credit Entry": "status"
-        }
-        df = df.rename(columns=col_map)
-        
-        if "sku" not in df.columns or "qty" not in df.columns:
-            return None, "Meesho file missing 'SKU' or 'Quantity' columns."
+        df, _ = schemas.read_csv_report(uploaded_file, "meesho")
 
-        df["sku"] = df["sku"].apply(clean_sku)
+        df["sku"] = normalize_skus(df["sku"])
         df["qty"] = pd.to_numeric(df["qty"], errors='coerce').fillna(0)
         
         # We include all rows (Delivered & RTO) as 'Demand'. 
-        # If you want to exclude RTOs later, we can filter by 'status' here.
+        # To exclude RTOs later, map 'Reason for Credit Entry' in the schema and filter here.
         
         df["platform"] = "Meesho"
-        return df[["sku", "qty", "platform"]], None
+        df["date"] = parse_order_dates(df.get("date"))
+        df["order_id"] = df.get("order_id")
+        return df[SALES_COLUMNS], None
         
     except Exception as e:
         return None, f"Error reading Meesho file: {str(e)}"
 
 def load_stock_levels(uploaded_file):
-    """Parses Current Stock Levels (CSV or Excel)."""
+    """
+    Parses Current Stock Levels (CSV or Excel): internal SKU, stock on hand and,
+    if the file has one, a quantity already on order (incoming / in transit).
+    Accepted column names are listed under "stock" in schemas.SCHEMAS.
+    """
     try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
+        name = getattr(uploaded_file, "name", uploaded_file)
+        if str(name).endswith('.csv'):
+            df, _ = schemas.read_csv_report(uploaded_file, "stock")
         else:
-            df = pd.read_excel(uploaded_file)
-        
-        df.columns = [c.strip().lower() for c in df.columns]
-        
-        sku_col = next((c for c in df.columns if 'sku' in c), None)
-        qty_col = next((c for c in df.columns if 'qty' in c or 'stock' in c), None)
+            df, _ = schemas.read_xlsx_report(uploaded_file, "stock")
         
-        if not sku_col or not qty_col:
-            return None, "Stock file must have 'sku' and 'qty' columns."
-            
-        df = df.rename(columns={sku_col: "internal_sku", qty_col: "stock_on_hand"})
-        
-        df["internal_sku"] = df["internal_sku"].apply(clean_sku)
+        df["internal_sku"] = normalize_skus(df["internal_sku"])
         df["stock_on_hand"] = pd.to_numeric(df["stock_on_hand"], errors='coerce').fillna(0)
+        df["on_order"] = pd.to_numeric(df["on_order"], errors='coerce').fillna(0) if "on_order" in df.columns else 0
         
-        return df[["internal_sku", "stock_on_hand"]], None
+        return df[STOCK_COLUMNS], None
 
     except Exception as e:
-        return None, f"Error reading Stock file: {str(e)}"
\ No newline at end of file
+        return None, f"Error reading Stock file: {str(e)}"
+
+# Platform key -> loader, used by load_all
+LOADERS = {
+    "amazon": load_amazon_sales,
+    "flipkart": load_flipkart_sales,
+    "meesho": load_meesho_sales
+}
+
+def timed_load(loader, uploaded_file, load_fn, kwargs):
+    """Worker body for load_jobs: runs one loader (optionally via load_fn) and times it."""
+    start = time.perf_counter()
+    if load_fn is None:
+        df, err = loader(uploaded_file, **kwargs)
+    else:
+        df, err = load_fn(loader, uploaded_file, **kwargs)
+    return df, err, time.perf_counter() - start
+
+def load_jobs(jobs, executor=None, options=None, load_fn=None, max_workers=8):
+    """
+    Parses any number of platform files concurrently.
+
+    jobs: {key: (platform, file)}; the key is only used to label the results,
+    so several files of one platform can be loaded together.
+    Other arguments as for load_all (the default thread pool is capped at max_workers).
+
+    Returns ({key: (df, err)}, {key: seconds}).
+    """
+    options = options or {}
+    results, timings = {}, {}
+    if not jobs:
+        return results, timings
+
+    own_executor = executor is None
+    if own_executor:
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)))
+    try:
+        futures = {
+            key: executor.submit(timed_load, LOADERS[platform], f, load_fn, options.get(platform, {}))
+            for key, (platform, f) in jobs.items()
+        }
+        for key, future in futures.items():
+            try:
+                df, err, elapsed = future.result()
+                results[key] = (df, err)
+                timings[key] = elapsed
+            except Exception as e:
+                platform = jobs[key][0]
+                results[key] = (None, f"Error reading {platform.title()} file: {str(e)}")
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    return results, timings
+
+def load_all(files, executor=None, options=None, load_fn=None):
+    """
+    Parses several platform files concurrently.
+
+    files:    {"amazon": file, "flipkart": file, "meesho": file}; None entries are skipped.
+    executor: any concurrent.futures executor. Defaults to a thread pool with one
+              worker per file, capped at load_jobs' max_workers (8). A
+              ProcessPoolExecutor also works as long as the files are
+              picklable (paths or BytesIO).
+    options:  per-platform keyword arguments for the loader, e.g. {"flipkart": {"engine": "stream"}}.
+    load_fn:  optional wrapper called as load_fn(loader, file, **kwargs), e.g. upload_cache.cached_load.
+
+    Returns ({platform: (df, err)}, {platform: seconds}); every loader keeps
+    its own (df, err) contract, so one bad file does not sink the others.
+    """
+    jobs = {platform: (platform, f) for platform, f in files.items() if f is not None}
+    return load_jobs(jobs, executor=executor, options=options, load_fn=load_fn)
@@ -0,0 +1,75 @@
+import hashlib
+from io import BytesIO
+
+import pandas as pd
+
+# Above this many plan rows the workbook is streamed with xlsxwriter's constant_memory mode
+CONSTANT_MEMORY_ROWS = 50000
+
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def plan_hash(plan_df, orphans_df=None):
+    """Content hash of a plan (and its orphans), used as the export cache key."""
+    h = hashlib.sha256()
+    for df in (plan_df, orphans_df):
+        if df is None:
+            continue
+        h.update("|".join(map(str, df.columns)).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def _write_rows(workbook, sheet_name, df):
+    """Writes a frame row by row (the order constant_memory mode requires)."""
+    sheet = workbook.add_worksheet(sheet_name)
+    sheet.write_row(0, 0, [str(c) for c in df.columns])
+    values = df.astype(object).where(df.notna(), None)
+    for r, row in enumerate(values.itertuples(index=False, name=None), start=1):
+        sheet.write_row(r, 0, row)
+
+def plan_to_excel(plan_df, orphans_df, target, constant_memory=None):
+    """
+    Writes the 'Purchase Plan' (+ 'Unknown SKUs') workbook to a path or file object.
+    constant_memory=None switches to xlsxwriter's streaming mode for plans over
+    CONSTANT_MEMORY_ROWS rows.
+    """
+    if constant_memory is None:
+        constant_memory = len(plan_df) > CONSTANT_MEMORY_ROWS
+
+    if constant_memory:
+        # pandas fills sheets column by column, which constant_memory can't take; write rows ourselves
+        import xlsxwriter
+        workbook = xlsxwriter.Workbook(target, {"constant_memory": True})
+        try:
+            _write_rows(workbook, 'Purchase Plan', plan_df)
+            if orphans_df is not None and not orphans_df.empty:
+                _write_rows(workbook, 'Unknown SKUs', orphans_df)
+        finally:
+            workbook.close()
+        return
+
+    with pd.ExcelWriter(target, engine='xlsxwriter') as writer:
+        plan_df.to_excel(writer, index=False, sheet_name='Purchase Plan')
+        if orphans_df is not None and not orphans_df.empty:
+            orphans_df.to_excel(writer, index=False, sheet_name='Unknown SKUs')
+
+def render(fmt, plan_df, orphans_df=None):
+    """Returns (bytes, file extension, mime type) for 'excel', 'csv' or 'parquet'."""
+    if fmt == "excel":
+        output = BytesIO()
+        plan_to_excel(plan_df, orphans_df, output)
+        return output.getvalue(), "xlsx", EXCEL_MIME
+    if fmt == "csv":
+        return plan_df.to_csv(index=False).encode("utf-8"), "csv", "text/csv"
+    if fmt == "parquet":
+        return plan_df.to_parquet(index=False), "parquet", "application/octet-stream"
+    raise ValueError(f"Unknown export format: {fmt}")
+
+def available_formats():
+    """Export formats usable in this environment (Parquet needs pyarrow)."""
+    formats = ["excel", "csv"]
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        pass
+    return formats
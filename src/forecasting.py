@@ -0,0 +1,96 @@
+import numpy as np
+
+# Days averaged to seed the smoothing level, so one odd first day doesn't dominate
+INIT_DAYS = 7
+
+# All methods take one platform's SKU x day matrix (from inventory_engine.build_platform_daily)
+# and return one forecast per SKU (expected units per day). They run the smoothing
+# recursion over days with array operations across every SKU at once.
+
+def _initial_level(matrix):
+    return matrix[:, :INIT_DAYS].mean(axis=1)
+
+def moving_average(matrix, window=28):
+    """Mean of the last `window` days."""
+    return matrix[:, -window:].mean(axis=1)
+
+def ses(matrix, alpha=0.2):
+    """Simple exponential smoothing: flat forecast at the final smoothed level."""
+    level = _initial_level(matrix)
+    for t in range(matrix.shape[1]):
+        level += alpha * (matrix[:, t] - level)
+    return level
+
+def holt(matrix, alpha=0.2, beta=0.1, horizon=1):
+    """Holt's linear trend: level + horizon * trend, floored at zero."""
+    level = _initial_level(matrix)
+    trend = np.zeros(matrix.shape[0])
+    for t in range(matrix.shape[1]):
+        prev_level = level
+        level = alpha * matrix[:, t] + (1 - alpha) * (level + trend)
+        trend = beta * (level - prev_level) + (1 - beta) * trend
+    return np.clip(level + horizon * trend, 0, None)
+
+def croston(matrix, alpha=0.1, sba=False):
+    """
+    Croston's method for intermittent demand: smooths the non-zero demand sizes
+    and the intervals between them separately; forecast = size / interval.
+    sba=True applies the Syntetos-Boylan bias correction (1 - alpha / 2).
+    Sizes and intervals are seeded with their whole-history means.
+    """
+    n_skus, n_days = matrix.shape
+    nonzero = matrix > 0
+    counts = nonzero.sum(axis=1)
+    has_demand = counts > 0
+    safe_counts = np.where(has_demand, counts, 1)
+
+    size = np.where(has_demand, matrix.sum(axis=1) / safe_counts, 0.0)
+    interval = np.where(has_demand, n_days / safe_counts, 1.0)
+    since_last = np.zeros(n_skus)
+
+    for t in range(n_days):
+        demand = matrix[:, t]
+        hit = nonzero[:, t]
+        since_last += 1
+        size = np.where(hit, size + alpha * (demand - size), size)
+        interval = np.where(hit, interval + alpha * (since_last - interval), interval)
+        since_last = np.where(hit, 0, since_last)
+
+    rate = np.where(has_demand, size / interval, 0.0)
+    if sba:
+        rate *= 1 - alpha / 2
+    return rate
+
+def sba(matrix, alpha=0.1):
+    """Croston with the Syntetos-Boylan approximation."""
+    return croston(matrix, alpha=alpha, sba=True)
+
+METHODS = {
+    "moving_average": moving_average,
+    "ses": ses,
+    "holt": holt,
+    "croston": croston,
+    "sba": sba
+}
+
+def forecast_ads(platform_daily, method="ses", undated_days=None, **params):
+    """
+    Forecast daily demand for every SKU in a build_platform_daily result.
+    Each platform is forecast over its own order-date span only (never over days
+    outside it, which hold no data) and the per-platform forecasts are summed.
+    Undated summary units carry no daily shape, so they are added as a flat
+    undated_units / undated_days on top (left out without undated_days).
+    Returns an array aligned with the keys (and so with daily_demand_stats rows).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown forecast method: {method}")
+    keys, series = platform_daily
+    forecast = np.zeros(len(keys))
+    for _, matrix in series.values():
+        # Day-major copy for the recursions, which walk one day (column) at a time;
+        # the moving average only slices the last days, so the copy would be wasted there
+        by_day = matrix if method == "moving_average" else np.asfortranarray(matrix, dtype=float)
+        forecast += METHODS[method](by_day, **params)
+    if undated_days:
+        forecast = forecast + keys["undated_units"].to_numpy() / undated_days
+    return forecast
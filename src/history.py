@@ -0,0 +1,195 @@
+"""
+Local sales history: every ingested report's order lines in one SQLite file.
+
+Order lines are keyed on (platform, order_id), so re-ingesting an overlapping
+report only adds the orders not seen before. Reports are also remembered by
+content hash, so a file that was already ingested isn't parsed again. Period
+summaries (no order dates) are kept per seller account (the latest one replaces
+earlier ones; unnamed summaries are all kept) with the number of days they cover. The planner then reads a demand window straight from the store:
+
+    conn = history.connect("data/sales_history.sqlite")
+    history.ingest_sources(conn, {"meesho": ["Orders_Oct.csv"]})
+    amazon_df, flipkart_df, meesho_df = history.load_window(conn, days=90)
+"""
+import hashlib
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from .data_loaders import LOADERS, SALES_COLUMNS
+from .upload_cache import read_upload_bytes
+
+DEFAULT_DB = "data/sales_history.sqlite"
+
+PLATFORM_NAMES = {"amazon": "Amazon", "flipkart": "Flipkart", "meesho": "Meesho"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales (
+    platform TEXT NOT NULL,
+    order_id TEXT,            -- NULL for period summaries (Amazon Business Report)
+    sku      TEXT NOT NULL,
+    qty      REAL NOT NULL,
+    day      TEXT,            -- ISO date; NULL when the report has no order dates
+    source   TEXT NOT NULL    -- content hash of the report the line came from
+);
+CREATE UNIQUE INDEX IF NOT EXISTS sales_order ON sales (platform, order_id) WHERE order_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS sales_day ON sales (day, platform, sku);
+CREATE INDEX IF NOT EXISTS sales_source ON sales (source);
+
+CREATE TABLE IF NOT EXISTS sources (
+    hash        TEXT PRIMARY KEY,
+    platform    TEXT NOT NULL,
+    name        TEXT,
+    lines       INTEGER NOT NULL,  -- order lines in the report
+    new_lines   INTEGER NOT NULL,  -- lines that were not already stored
+    dated       INTEGER NOT NULL,  -- 0 for period summaries
+    ingested_at TEXT NOT NULL,
+    account     TEXT,              -- seller account of a period summary; NULL if not given
+    period_days INTEGER            -- days a period summary covers
+);
+"""
+
+# Columns added to `sources` after the first release; older stores get them on connect
+_SOURCE_COLUMNS = {"account": "TEXT", "period_days": "INTEGER"}
+
+def connect(db_path=DEFAULT_DB):
+    """Opens (creating if needed) the history store."""
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(sources)")}
+    for column, kind in _SOURCE_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE sources ADD COLUMN {column} {kind}")
+    return conn
+
+def source_hash(platform, uploaded_file):
+    return hashlib.sha256(platform.encode() + b"|" + read_upload_bytes(uploaded_file)).hexdigest()
+
+def is_ingested(conn, digest):
+    return conn.execute("SELECT 1 FROM sources WHERE hash = ?", (digest,)).fetchone() is not None
+
+def ingest(conn, platform, sales_df, digest, name=None, account=None, period_days=None):
+    """
+    Stores one parsed report (data_loaders output). Lines whose (platform, order_id)
+    is already stored are skipped. Returns the number of new lines.
+
+    A report without order dates is a period summary covering period_days days.
+    load_window keeps the latest summary per `account`; a summary stored without
+    an account is never replaced (reports carry no seller ID to tell accounts apart).
+    """
+    day = pd.to_datetime(sales_df["date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    dated = bool(day.notna().any())
+    account = (account or "").strip() or None
+    order_id = sales_df["order_id"] if "order_id" in sales_df.columns else pd.Series(None, index=sales_df.index)
+    rows = zip(
+        [PLATFORM_NAMES[platform]] * len(sales_df),
+        order_id.astype(object).where(order_id.notna(), None),
+        sales_df["sku"].astype(str),
+        sales_df["qty"].astype(float),
+        day.astype(object).where(day.notna(), None),
+        [digest] * len(sales_df)
+    )
+    with conn:
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO sales (platform, order_id, sku, qty, day, source) VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        new_lines = conn.total_changes - before
+        conn.execute(
+            "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (digest, platform, name, len(sales_df), new_lines, int(dated), datetime.now().isoformat(),
+             None if dated else account, None if dated else period_days)
+        )
+    return new_lines
+
+def ingest_sources(conn, sources, load_fn=None, options=None, account=None, period_days=None):
+    """
+    Ingests {platform: [uploaded files or paths]}. Reports already in the store
+    (same content hash) are skipped before parsing.
+    load_fn / options: as for data_loaders.load_all.
+    account / period_days: stored with period summaries (see ingest).
+    Returns (errors, new_lines): {file name: err} and {file name: lines added}.
+    """
+    options = options or {}
+    errors, new_lines = {}, {}
+    for platform, files in sources.items():
+        for f in files or []:
+            name = os.path.basename(os.fspath(f)) if isinstance(f, (str, os.PathLike)) else getattr(f, "name", "upload")
+            digest = source_hash(platform, f)
+            if is_ingested(conn, digest):
+                continue
+            loader = LOADERS[platform]
+            kwargs = options.get(platform, {})
+            df, err = loader(f, **kwargs) if load_fn is None else load_fn(loader, f, **kwargs)
+            if err:
+                errors[name] = err
+                continue
+            new_lines[name] = ingest(conn, platform, df, digest, name, account=account, period_days=period_days)
+    return errors, new_lines
+
+def is_empty(conn):
+    return conn.execute("SELECT 1 FROM sales LIMIT 1").fetchone() is None
+
+def date_range(conn):
+    """(first day, last day) of the dated lines in the store, or (None, None)."""
+    return conn.execute("SELECT MIN(day), MAX(day) FROM sales WHERE day IS NOT NULL").fetchone()
+
+def load_window(conn, days=None, end=None):
+    """
+    Daily demand per platform for the `days` days up to `end` (default: the last
+    stored day; days=None means all history), summed per (sku, day) in SQL over
+    the day index.
+
+    Period summaries carry no dates. For those the most recently ingested summary
+    of each seller account, plus every summary stored without an account, is
+    added (as undated rows, like a fresh upload), scaled
+    by days / period_days so it covers the same number of days as the window.
+    With days=None, or for a summary stored without a period, units are added as is.
+    Returns (amazon_df, flipkart_df, meesho_df) in the data_loaders format
+    (None for a platform without data).
+    """
+    first, last = date_range(conn)
+    end = end or last
+    params, where = [], "day IS NOT NULL"
+    if end:
+        where += " AND day <= ?"
+        params.append(str(end)[:10])
+        if days:
+            start = (datetime.fromisoformat(str(end)[:10]) - timedelta(days=int(days) - 1)).strftime("%Y-%m-%d")
+            where += " AND day >= ?"
+            params.append(start)
+
+    dated = pd.read_sql_query(
+        f"SELECT platform, sku, day, SUM(qty) AS qty FROM sales WHERE {where} GROUP BY platform, sku, day",
+        conn, params=params
+    )
+    undated = pd.read_sql_query(
+        """
+        SELECT s.platform, s.sku, NULL AS day,
+               SUM(s.qty) * COALESCE(CAST(? AS REAL) / NULLIF(latest.period_days, 0), 1) AS qty
+        FROM sales s
+        JOIN (
+            SELECT hash, period_days FROM sources src
+            WHERE dated = 0 AND ingested_at = (
+                SELECT MAX(ingested_at) FROM sources
+                WHERE dated = 0 AND platform = src.platform AND COALESCE(account, hash) = COALESCE(src.account, src.hash)
+            )
+        ) latest ON s.source = latest.hash
+        WHERE s.day IS NULL
+        GROUP BY s.platform, s.sku, s.source
+        """,
+        conn, params=[days]
+    )
+    lines = pd.concat([dated, undated], ignore_index=True)
+    lines["date"] = pd.to_datetime(lines["day"])
+    lines["order_id"] = None
+
+    frames = []
+    for platform, label in PLATFORM_NAMES.items():
+        df = lines[lines["platform"] == label]
+        frames.append(df[SALES_COLUMNS].reset_index(drop=True) if not df.empty else None)
+    return tuple(frames)
@@ -0,0 +1,73 @@
+"""
+Import-time budget check for the planner modules.
+
+    python -m src.importtime            # uses "import_budget" from config/settings.json
+    python -m src.importtime --config other.json
+
+Each module is imported in a fresh interpreter under `python -X importtime`.
+A module fails if its cumulative import time exceeds max_ms, or if it pulls in
+any module listed under "forbid" (e.g. the CLI must not load pandas at start-up,
+and no planner module may load openpyxl / xlsxwriter / matplotlib up front).
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+def measure(module):
+    """Returns ({imported module: cumulative microseconds}, error text) for one fresh import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            timings[name.strip()] = int(cumulative)
+    error = proc.stderr.strip().splitlines()[-1] if proc.returncode else None
+    return timings, error
+
+def check(budgets):
+    """Prints one line per module; returns the number of modules over budget."""
+    failures = 0
+    for module, budget in budgets.items():
+        timings, error = measure(module)
+        if error:
+            print(f"FAIL {module}: import failed ({error})")
+            failures += 1
+            continue
+
+        total_ms = timings.get(module, 0) / 1000
+        loaded = set(timings)
+        forbidden = sorted(
+            name for name in loaded
+            for banned in budget.get("forbid", [])
+            if name == banned or name.startswith(banned + ".")
+        )
+        over = total_ms > budget.get("max_ms", float("inf"))
+
+        status = "FAIL" if over or forbidden else "ok"
+        detail = f"{total_ms:.0f} ms (budget {budget.get('max_ms', '-')} ms)"
+        if forbidden:
+            detail += f", loads {', '.join(forbidden[:5])}"
+        print(f"{status:4} {module}: {detail}")
+        failures += status == "FAIL"
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.importtime", description="Check planner import times against a budget.")
+    parser.add_argument("--config", default="config/settings.json")
+    args = parser.parse_args(argv)
+
+    with open(args.config, "r") as f:
+        budgets = json.load(f).get("import_budget", {})
+    if not budgets:
+        print("No import_budget section in settings.")
+        return 0
+    return 1 if check(budgets) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
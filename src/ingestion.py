@@ -0,0 +1,198 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from .data_loaders import load_jobs
+from .inventory_engine import preaggregate_sales
+from .schemas import sniff_report
+from .upload_cache import read_upload_bytes
+
+# File extensions picked up per platform in folder-watch mode
+WATCH_EXTENSIONS = {
+    "amazon": (".csv",),
+    "flipkart": (".xlsx",),
+    "meesho": (".csv",)
+}
+
+def folder_sources(folder):
+    """
+    Lists report files under <folder>/<platform>/ (amazon, flipkart, meesho),
+    plus any report dropped straight into <folder>/ under the None key.
+    Returns {platform or None: [paths]}; pass it through route_sources before
+    DemandLedger.sync.
+    """
+    loose = sorted(
+        os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.lower().endswith((".csv", ".xlsx")) and os.path.isfile(os.path.join(folder, name))
+    )
+    sources = {None: loose} if loose else {}
+    for platform, extensions in WATCH_EXTENSIONS.items():
+        platform_dir = os.path.join(folder, platform)
+        if not os.path.isdir(platform_dir):
+            continue
+        sources[platform] = sorted(
+            os.path.join(platform_dir, name)
+            for name in os.listdir(platform_dir)
+            if name.lower().endswith(extensions)
+        )
+    return sources
+
+def _source_name(platform, source):
+    """Display name for a report, e.g. 'Amazon: BusinessReport.csv'."""
+    if isinstance(source, (str, os.PathLike)):
+        name = os.path.basename(os.fspath(source))
+    else:
+        name = getattr(source, "name", None) or "upload"
+    return f"{platform.title()}: {name}"
+
+def route_sources(sources):
+    """
+    Sorts reports by what their header row says they are (schemas.sniff_report),
+    so a file can be dropped in any slot or in bulk.
+
+    sources: {slot: [files]}, slot being a platform key or None for bulk drops.
+    Returns ({report: [files]}, {name: error}); report keys are the SCHEMAS keys
+    ('amazon', 'flipkart', 'meesho', 'stock'). A file no layout fits stays in
+    its slot, so its loader reports the missing columns; from the bulk slot it
+    is listed as an error instead.
+    """
+    routed, errors = {}, {}
+    for slot, files in sources.items():
+        for source in files:
+            report = sniff_report(source) or slot
+            if report is None:
+                errors[_source_name("report", source)] = "Not recognised as an Amazon, Flipkart, Meesho or stock report."
+                continue
+            routed.setdefault(report, []).append(source)
+    return routed, errors
+
+def dedup_orders(sales_df, seen):
+    """
+    Drops order lines whose order_id is in `seen` (or repeats earlier in the
+    same file) and adds the kept IDs to `seen`. Rows without an order ID (period
+    summaries) are always kept. One set lookup per row, so the cost is linear in
+    the new file alone, not in everything ingested before it.
+    Returns (kept rows, number of duplicate lines dropped).
+    """
+    if "order_id" not in sales_df.columns:
+        return sales_df, 0
+    ids = sales_df["order_id"]
+    has_id = ids.notna().to_numpy()
+    if not has_id.any():
+        return sales_df, 0
+
+    known = np.fromiter((order_id in seen for order_id in ids.tolist()), dtype=bool, count=len(ids))
+    drop = has_id & (known | ids.duplicated().to_numpy())
+    seen.update(ids[has_id & ~drop].tolist())
+
+    dropped = int(drop.sum())
+    return (sales_df[~drop] if dropped else sales_df), dropped
+
+def _merge_demand(running, new):
+    """Folds one file's (sku, platform, date, qty) rows into the running table."""
+    if running is None or running.empty:
+        return new.reset_index(drop=True)
+    return preaggregate_sales(pd.concat([running, new], ignore_index=True), by_date=True)
+
+class DemandLedger:
+    """
+    Running per-(sku, platform, day) demand built up one report at a time.
+
+    Each report is keyed by platform + content hash, parsed once, stripped of
+    order lines already seen in earlier reports (dedup_orders), collapsed to
+    one row per SKU and folded into the running table. Re-syncing with the
+    same files is a hash check; adding the Nth file costs one parse, one set
+    lookup per line and one catalog-sized merge, so overlapping reports only
+    add their new orders. Keep one ledger per session (e.g. in st.session_state).
+    """
+
+    def __init__(self):
+        self.files = {}      # key -> {"platform", "name", "lines", "demand", "duplicates"}
+        self.demand = {}     # platform -> running (sku, platform, date, qty) frame
+        self.seen = {}       # platform -> set of order IDs already counted
+        self._path_keys = {} # (path, mtime_ns, size) -> key, so watched files aren't re-hashed
+
+    def _key(self, platform, source):
+        if isinstance(source, (str, os.PathLike)):
+            stat = os.stat(source)
+            stamp = (os.fspath(source), stat.st_mtime_ns, stat.st_size)
+            if stamp not in self._path_keys:
+                self._path_keys[stamp] = f"{platform}:{hashlib.sha256(read_upload_bytes(source)).hexdigest()}"
+            return self._path_keys[stamp]
+        return f"{platform}:{hashlib.sha256(read_upload_bytes(source)).hexdigest()}"
+
+    def sync(self, sources, load_fn=None, options=None, executor=None):
+        """
+        Makes the ledger reflect exactly the given files.
+
+        sources: {platform: [uploaded files or paths]}
+        load_fn / options: as for data_loaders.load_all.
+        New files are parsed concurrently with data_loaders.load_jobs; files no
+        longer listed are dropped.
+        Returns (errors, timings): {file name: err} and {file name: seconds}
+        for the files parsed in this call.
+        """
+        wanted = {}
+        for platform, files in sources.items():
+            for f in files or []:
+                wanted[self._key(platform, f)] = (platform, f)
+
+        removed = [key for key in self.files if key not in wanted]
+        for key in removed:
+            del self.files[key]
+        if removed:
+            self._rebuild()
+
+        new = {key: job for key, job in wanted.items() if key not in self.files}
+        results, elapsed = load_jobs(new, executor=executor, options=options, load_fn=load_fn)
+        errors, timings = {}, {}
+        for key, (df, err) in results.items():
+            platform, f = new[key]
+            name = _source_name(platform, f)
+            timings[name] = elapsed.get(key, 0.0)
+            if err:
+                errors[name] = err
+                continue
+            self._add(key, platform, name, df)
+
+        return errors, timings
+
+    def _add(self, key, platform, name, lines):
+        # Only lines carrying an order ID are kept, for re-deduplicating after a removal
+        has_ids = "order_id" in lines.columns and lines["order_id"].notna().any()
+        entry = {"platform": platform, "name": name, "lines": lines if has_ids else None}
+        self.files[key] = entry
+        self._fold(entry, lines)
+
+    def _fold(self, entry, lines):
+        """Dedups a file's order lines against earlier files and merges what is new."""
+        platform = entry["platform"]
+        if entry["lines"] is not None:
+            lines, entry["duplicates"] = dedup_orders(lines, self.seen.setdefault(platform, set()))
+            entry["demand"] = preaggregate_sales(lines, by_date=True)
+        elif "demand" not in entry:
+            # No order IDs (e.g. Amazon summary): nothing to dedup on
+            entry["duplicates"] = 0
+            entry["demand"] = preaggregate_sales(lines, by_date=True)
+        self.demand[platform] = _merge_demand(self.demand.get(platform), entry["demand"])
+
+    def _rebuild(self):
+        """Recomputes the running tables from the per-file frames (after a removal)."""
+        self.demand = {}
+        self.seen = {}
+        for entry in self.files.values():
+            self._fold(entry, entry["lines"])
+
+    def duplicate_lines(self):
+        """Order lines skipped because an earlier report already had them."""
+        return sum(entry["duplicates"] for entry in self.files.values())
+
+    def frames(self):
+        """Running demand per platform, in the (amazon, flipkart, meesho) order aggregate_demand takes."""
+        return tuple(self.demand.get(platform) for platform in ("amazon", "flipkart", "meesho"))
+
+    def file_names(self, platform=None):
+        return [e["name"] for e in self.files.values() if platform is None or e["platform"] == platform]
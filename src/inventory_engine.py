@@ -1,6 +1,27 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from statistics import NormalDist
+
 import pandas as pd
 import numpy as np
 
+# Bump when the layout produced by compile_master_index changes
+MASTER_INDEX_VERSION = 2
+MASTER_INDEX_KEY = "sku_key"
+
+# One demand row per base item (the thing sitting in the warehouse)
+GROUP_COLS = ["internal_sku", "supplier", "category"]
+
+# Platform value in the sales rows -> prefix of its split columns in the demand table
+PLATFORMS = {"Amazon": "amazon", "Flipkart": "flipkart", "Meesho": "meesho"}
+PLATFORM_UNIT_COLS = [f"{prefix}_units" for prefix in PLATFORMS.values()]
+PLATFORM_SHARE_COLS = [f"{prefix}_share_pct" for prefix in PLATFORMS.values()]
+
+# filepath -> (mtime_ns, size, compiled index); saves re-reading the artifact on every rerun
+_master_index_memo = {}
+
 def load_master_data(filepath):
     try:
         df = pd.read_csv(filepath)
@@ -17,31 +38,195 @@ def load_master_data(filepath):
     except Exception as e:
         return None, str(e)
 
-def generate_purchase_plan(amazon_df, flipkart_df, meesho_df, master_df, sales_days, purchase_days, lead_time, safety_stock_days):
+def compile_master_index(master_df):
+    """
+    Builds the lookup form of the master list: one row per normalized
+    marketplace_sku, indexed by that SKU so sales can be resolved to row
+    positions (integer codes) with a single hash lookup per SKU.
+    Duplicate marketplace SKUs keep their first row (a plain merge would count
+    their sales once per row); they are listed by duplicate_master_skus.
+    """
+    duplicated = master_df["marketplace_sku"].duplicated(keep="first")
+    master = master_df[~duplicated].reset_index(drop=True)
+    master.index = pd.Index(master["marketplace_sku"], name=MASTER_INDEX_KEY)
+    master.attrs["duplicate_skus"] = sorted(master_df.loc[duplicated, "marketplace_sku"].unique())
+    return master
+
+def duplicate_master_skus(master_df):
+    """Marketplace SKUs listed more than once in the master; only their first row is used."""
+    if is_master_index(master_df):
+        return master_df.attrs.get("duplicate_skus", [])
+    return sorted(master_df.loc[master_df["marketplace_sku"].duplicated(), "marketplace_sku"].unique())
+
+def is_master_index(master_df):
+    return master_df.index.name == MASTER_INDEX_KEY and master_df.index.is_unique
+
+def _file_sha256(filepath):
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_master_index(filepath):
+    """
+    Loads the compiled master index for a master CSV, rebuilding it only when
+    the CSV changes. The compiled form is persisted next to the CSV as
+    '<csv>.idx.pkl' and is considered fresh when the CSV's mtime/size match,
+    or failing that, when its content hash matches.
+    Returns (index_df, error) like load_master_data.
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError as e:
+        return None, str(e)
+
+    memo = _master_index_memo.get(filepath)
+    if memo and memo[0] == stat.st_mtime_ns and memo[1] == stat.st_size:
+        return memo[2], None
+
+    artifact_path = f"{filepath}.idx.pkl"
+    payload = None
+    try:
+        with open(artifact_path, "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("version") != MASTER_INDEX_VERSION:
+            payload = None
+    except Exception:
+        payload = None
+
+    digest = None
+    if payload is None:
+        stale = True
+    elif payload["mtime_ns"] == stat.st_mtime_ns and payload["size"] == stat.st_size:
+        stale = False
+    else:
+        # Touched but possibly unchanged (e.g. re-saved or checked out again)
+        digest = _file_sha256(filepath)
+        stale = payload["sha256"] != digest
+
+    if stale:
+        master_df, err = load_master_data(filepath)
+        if err:
+            return None, err
+        master = compile_master_index(master_df)
+    else:
+        master = payload["master"]
+
+    if digest is not None or stale:
+        # (Re)write the artifact so the next start is an mtime check only
+        payload = {
+            "version": MASTER_INDEX_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest or _file_sha256(filepath),
+            "master": master
+        }
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(artifact_path) or ".", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(payload, f)
+            os.replace(tmp_path, artifact_path)
+        except OSError:
+            # Read-only config folder: still usable, just recompiled next time
+            pass
+
+    _master_index_memo[filepath] = (stat.st_mtime_ns, stat.st_size, master)
+    return master, None
+
+def preaggregate_sales(sales_df, by_date=False):
     """
+    Collapses order lines to one row per (sku, platform) with summed qty.
+    by_date=True keeps one row per order day instead (undated rows stay as NaT).
+    """
+    keys = ["sku", "platform"]
+    if by_date and "date" in sales_df.columns:
+        keys.append("date")
+    return sales_df.groupby(keys, sort=False, as_index=False, dropna=False)["qty"].sum()
+
+def _combine_sales(amazon_df, flipkart_df, meesho_df, preaggregate=False):
+    """Concatenates the non-empty platform frames (None if there is nothing to plan on)."""
+    # We filter out None or Empty dataframes to prevent errors if a file wasn't uploaded
+    dfs_to_merge = [df for df in [amazon_df, flipkart_df, meesho_df] if df is not None and not df.empty]
+    if not dfs_to_merge:
+        return None
+
+    if preaggregate:
+        dfs_to_merge = [preaggregate_sales(df) for df in dfs_to_merge]
+
+    return pd.concat(dfs_to_merge, ignore_index=True)
+
+def _resolve_master(sales_data, master_df):
+    """
+    Integer-code left join of sales onto the master list.
+    Returns (master, rows, orphan_mask, sku_codes, sku_uniques) where rows[i] is the
+    master row position of sales row i, or -1 if the SKU is not in Master.
+    """
+    # Each distinct SKU string is hashed once; rows then pick up their position by code.
+    master = master_df if is_master_index(master_df) else compile_master_index(master_df)
+    sku_codes, sku_uniques = pd.factorize(sales_data["sku"])
+    rows = master.index.get_indexer(sku_uniques)[sku_codes]
+
+    has_internal = master["internal_sku"].notna().to_numpy()
+    orphan_mask = (rows < 0) | ~has_internal[rows]
+    return master, rows, orphan_mask, sku_codes, sku_uniques
+
+def aggregate_demand(amazon_df, flipkart_df, meesho_df, master_df, engine="codes", preaggregate=True):
+    """
+    Expensive half of the planner (depends only on the uploads + master list):
     1. Merges Sales Data (Amazon + Flipkart + Meesho)
     2. Maps to Master Data (Base SKU & Pack Qty)
-    3. Calculates Daily Velocity (ADS)
-    4. Computes Reorder Point logic
+    3. Sums base units per internal SKU, with the per-platform split
+       (<platform>_units and <platform>_share_pct columns) from the same groupby
+
+    Returns (demand, orphans). The demand table can be reused across any
+    number of apply_reorder_params calls.
+
+    engine="codes" joins and groups on integer codes; engine="strings" is the
+    plain string groupby, kept as the reference implementation.
+    preaggregate=True collapses each platform to one row per SKU first, so the
+    join scales with the catalog rather than the number of order lines.
     """
     
     # 1. Combine Sales
-    # We filter out None or Empty dataframes to prevent errors if a file wasn't uploaded
-    dfs_to_merge = [df for df in [amazon_df, flipkart_df, meesho_df] if df is not None and not df.empty]
-    
-    if not dfs_to_merge:
+    sales_data = _combine_sales(amazon_df, flipkart_df, meesho_df, preaggregate=preaggregate)
+    if sales_data is None:
         # Return empty structures if no data is available
         return pd.DataFrame(), pd.DataFrame()
+    
+    if engine == "codes":
+        # 2. Merge with Master Data
+        # Resolve each sales SKU to a master row position (-1 = not in Master), so
+        # unknown SKUs survive as orphans.
+        resolved = _resolve_master(sales_data, master_df)
+        orphan_mask = resolved[2]
+        
+        # 3. Identify Orphan SKUs (Items sold but not in Master List)
+        orphans = sales_data[orphan_mask].groupby(["sku", "platform"])["qty"].sum().reset_index()
+        demand = _group_demand_by_codes(sales_data, resolved)
+    elif engine == "strings":
+        demand, orphans = _group_demand_by_strings(sales_data, master_df)
+    else:
+        raise ValueError(f"Unknown aggregation engine: {engine}")
+    
+    return demand, orphans
 
-    sales_data = pd.concat(dfs_to_merge, ignore_index=True)
+def _group_demand_by_strings(sales_data, master_df):
+    """
+    Reference path: a plain left merge on the SKU strings, then a string groupby.
+    Shares no lookup code with the codes engine. Given the raw master, duplicate
+    marketplace SKUs fan out here but not there (see compile_master_index).
+    """
+    if is_master_index(master_df):
+        master_df = master_df.reset_index(drop=True)
     
     # 2. Merge with Master Data
     # Left join ensures we keep sales data even if it's missing from Master (so we can show orphans)
     merged = pd.merge(
-        sales_data, 
-        master_df, 
-        left_on="sku", 
-        right_on="marketplace_sku", 
+        sales_data,
+        master_df,
+        left_on="sku",
+        right_on="marketplace_sku",
         how="left"
     )
     
@@ -58,37 +243,373 @@ def generate_purchase_plan(amazon_df, flipkart_df, meesho_df, master_df, sales_d
     # 5. Calculate Total BASE Units Sold
     # If I sell 10 packs of 5, I sold 50 base units.
     merged["base_units_sold"] = merged["qty"] * merged["pack_qty"]
+    merged = merged.assign(**_platform_units(merged["platform"], merged["base_units_sold"]))
     
     # 6. Group by INTERNAL SKU (The item sitting in the warehouse)
     # We aggregate demand across all marketplaces and pack sizes.
-    group_cols = ["internal_sku", "supplier", "category"]
-    plan = merged.groupby(group_cols).agg(
+    demand = merged.groupby(GROUP_COLS).agg(
+        total_sold_units=('base_units_sold', 'sum'),
+        sku_count=('marketplace_sku', 'nunique'), # How many listings map to this base item
+        **{col: (col, 'sum') for col in PLATFORM_UNIT_COLS}
+    ).reset_index()
+    
+    return _add_platform_shares(demand), orphans
+
+def _platform_units(platforms, base_units):
+    """
+    One column of base units per platform (zero on other platforms' rows), so the
+    split is summed by the same groupby as the total instead of a pivot + merges.
+    """
+    platform_codes, platform_names = pd.factorize(platforms)
+    units = np.asarray(base_units, dtype=float)
+    columns = {}
+    for name, col in zip(PLATFORMS, PLATFORM_UNIT_COLS):
+        code = platform_names.get_indexer([name])[0]
+        columns[col] = np.where(platform_codes == code, units, 0.0) if code >= 0 else np.zeros(len(units))
+    return columns
+
+def _add_platform_shares(demand):
+    """Share of each platform in total_sold_units, in percent (0 when nothing sold)."""
+    total = demand["total_sold_units"].to_numpy(dtype=float)
+    safe_total = np.where(total > 0, total, 1)
+    for units_col, share_col in zip(PLATFORM_UNIT_COLS, PLATFORM_SHARE_COLS):
+        demand[share_col] = np.round(100 * demand[units_col].to_numpy() / safe_total, 1)
+    return demand
+
+def _encode(values, extra=()):
+    """Sorted categories + per-value codes, so code order matches string sort order."""
+    categories = pd.Index(values).append(pd.Index(list(extra))).dropna().unique().sort_values()
+    return categories, categories.get_indexer(values)
+
+def _encode_sales(sales_data, resolved):
+    """
+    Turns internal SKU / supplier / category into integer codes on the (small) master
+    table once and hands them to sales rows by position. Applies the same defaults as
+    the string path. Returns (coded, categories) where coded has one row per sales
+    row and categories maps each code column back to its sorted string Index.
+    """
+    master, rows, orphan_mask, sku_codes, sku_uniques = resolved
+    matched = rows >= 0
+    safe_rows = np.where(matched, rows, 0)
+    
+    # 4. Master attributes as codes, with the same defaults as the string path
+    supplier = master["supplier"].fillna("Unknown")
+    category = master["category"].fillna("Uncategorized")
+    supplier_cats, supplier_codes = _encode(supplier, ["Unknown"])
+    category_cats, category_codes = _encode(category, ["Uncategorized"])
+    
+    # Orphans fall back to their marketplace SKU as the internal SKU
+    orphan_sku_codes = np.unique(sku_codes[orphan_mask])
+    internal_cats, internal_codes = _encode(master["internal_sku"], sku_uniques.take(orphan_sku_codes))
+    
+    row_internal = internal_codes[safe_rows]
+    row_internal[orphan_mask] = internal_cats.get_indexer(sku_uniques)[sku_codes[orphan_mask]]
+    row_supplier = np.where(matched, supplier_codes[safe_rows], supplier_cats.get_loc("Unknown"))
+    row_category = np.where(matched, category_codes[safe_rows], category_cats.get_loc("Uncategorized"))
+    pack_qty = np.where(matched, master["pack_qty"].fillna(1).to_numpy()[safe_rows], 1)
+    
+    # 5. Base units sold
+    coded = pd.DataFrame({
+        "internal_sku": row_internal,
+        "supplier": row_supplier,
+        "category": row_category,
+        "base_units_sold": sales_data["qty"].to_numpy() * pack_qty,
+        "listing": np.where(matched, rows, np.nan)
+    })
+    categories = {"internal_sku": internal_cats, "supplier": supplier_cats, "category": category_cats}
+    return coded, categories
+
+def _decode_keys(frame, categories):
+    for col, cats in categories.items():
+        frame[col] = cats.take(frame[col])
+    return frame
+
+def _group_demand_by_codes(sales_data, resolved):
+    """
+    Same result as _group_demand_by_strings, but the groupby runs on the integer
+    codes from _encode_sales and only the grouped keys are decoded.
+    """
+    coded, categories = _encode_sales(sales_data, resolved)
+    coded = coded.assign(**_platform_units(sales_data["platform"], coded["base_units_sold"]))
+    
+    # 6. Group by INTERNAL SKU on the integer codes, then decode the keys
+    demand = coded.groupby(GROUP_COLS).agg(
         total_sold_units=('base_units_sold', 'sum'),
-        sku_count=('marketplace_sku', 'nunique') # How many listings map to this base item
+        sku_count=('listing', 'nunique'),
+        **{col: (col, 'sum') for col in PLATFORM_UNIT_COLS}
     ).reset_index()
     
+    return _add_platform_shares(_decode_keys(demand, categories))
+
+def order_date_spans(sales_df):
+    """{platform: (first day, last day)} of the dated order lines, per platform."""
+    if sales_df is None or "date" not in sales_df.columns:
+        return {}
+    dates = pd.to_datetime(sales_df["date"], errors="coerce").dt.normalize()
+    dated = dates.notna()
+    if not dated.any():
+        return {}
+    bounds = dates[dated].groupby(sales_df["platform"][dated].astype(str)).agg(["min", "max"])
+    return {platform: (row["min"], row["max"]) for platform, row in bounds.iterrows()}
+
+def build_platform_daily(amazon_df, flipkart_df, meesho_df, master_df):
+    """
+    Daily base-unit demand per internal SKU, one dense SKU x day matrix per
+    platform, each covering only that platform's own first to last order date
+    (e.g. a September Flipkart export next to an October Meesho one).
+
+    Returns (keys, {platform: (days, matrix)}):
+      keys   - DataFrame of internal_sku / supplier / category, one row per matrix row
+               (the same rows, in the same order, for every platform, as in
+               aggregate_demand's demand table), plus undated_units (period-summary
+               units, which have no daily shape) and has_dated
+      days   - the platform's DatetimeIndex; matrix - float ndarray (len(keys), len(days))
+    Returns None if no sales row carries a date.
+    """
+    sales_data = _combine_sales(amazon_df, flipkart_df, meesho_df)
+    if sales_data is None or "date" not in sales_data.columns:
+        return None
+    dates = pd.to_datetime(sales_data["date"], errors="coerce").dt.normalize()
+    spans = order_date_spans(sales_data)
+    if not spans:
+        return None
+
+    coded, categories = _encode_sales(sales_data, _resolve_master(sales_data, master_df))
+    grouped = coded.groupby(GROUP_COLS)
+    group_ids = grouped.ngroup().to_numpy()
+    keys = _decode_keys(grouped.size().reset_index()[GROUP_COLS], categories)
+
+    n_skus = len(keys)
+    units = coded["base_units_sold"].to_numpy(dtype=float)
+    dated = dates.notna().to_numpy()
+    platforms = sales_data["platform"].astype(str).to_numpy()
+
+    series = {}
+    has_dated = np.zeros(n_skus, dtype=bool)
+    for platform, (first, last) in spans.items():
+        rows = dated & (platforms == platform)
+        days = pd.date_range(first, last, freq="D")
+        day_idx = (dates[rows] - first).dt.days.to_numpy()
+        flat = np.bincount(group_ids[rows] * len(days) + day_idx, weights=units[rows], minlength=n_skus * len(days))
+        series[platform] = (days, flat.reshape(n_skus, len(days)))
+        has_dated |= np.bincount(group_ids[rows], minlength=n_skus) > 0
+
+    keys["undated_units"] = np.bincount(group_ids[~dated], weights=units[~dated], minlength=n_skus)
+    keys["has_dated"] = has_dated
+    return keys, series
+
+def _trend(matrix):
+    """Least-squares slope of each row over its days (units/day gained per day)."""
+    n_days = matrix.shape[1]
+    t = np.arange(n_days) - (n_days - 1) / 2
+    denom = (t ** 2).sum()
+    return (matrix - matrix.mean(axis=1)[:, None]) @ t / denom if denom else np.zeros(matrix.shape[0])
+
+def combine_platform_daily(platform_daily):
+    """
+    One SKU x day matrix from build_platform_daily's per-platform series.
+
+    Returns (keys, days, matrix) with days covering the first to last order date
+    of any platform. Outside its own span a platform's row holds its average over
+    the span, so the matrix mean is the sum of each platform's own ADS; those
+    filled days are not data, so the per-platform statistics are added to keys
+    instead: dated_std (from the summed per-platform variances) and dated_trend
+    (the summed per-platform slopes), each over that platform's span.
+    """
+    keys, series = platform_daily
+    keys = keys.copy()
+    start = min(days[0] for days, _ in series.values())
+    days = pd.date_range(start, max(days[-1] for days, _ in series.values()), freq="D")
+
+    matrix = np.zeros((len(keys), len(days)))
+    variance = np.zeros(len(keys))
+    trend = np.zeros(len(keys))
+    for own_days, own in series.values():
+        lo = (own_days[0] - start).days
+        hi = lo + len(own_days)
+        rate = own.mean(axis=1)
+        matrix[:, :lo] += rate[:, None]
+        matrix[:, lo:hi] += own
+        matrix[:, hi:] += rate[:, None]
+        if len(own_days) > 1:
+            variance += own.var(axis=1, ddof=1)
+        trend += _trend(own)
+
+    keys["dated_std"] = np.sqrt(variance)
+    keys["dated_trend"] = trend
+    return keys, days, matrix
+
+def build_daily_demand(amazon_df, flipkart_df, meesho_df, master_df):
+    """
+    Daily base-unit demand per internal SKU as a dense SKU x day matrix:
+    build_platform_daily followed by combine_platform_daily. Rows without a date
+    (the Amazon Business Report is a period summary) stay out of the matrix as
+    keys' undated_units; daily_demand_stats spreads them over the typed sales period.
+    Returns (keys, days, matrix), or None if no sales row carries a date.
+    """
+    platform_daily = build_platform_daily(amazon_df, flipkart_df, meesho_df, master_df)
+    return combine_platform_daily(platform_daily) if platform_daily is not None else None
+
+def daily_demand_stats(daily, undated_days=None):
+    """
+    Vectorized per-SKU stats from the daily matrix: ADS, the standard deviation of
+    dated daily demand and the least-squares trend of daily demand (units/day
+    gained per day), both of the latter over each platform's own days. Undated
+    summary units are added to ADS as undated_units / undated_days (the typed
+    sales period); without undated_days they are left out.
+    Returns a DataFrame aligned with daily's keys.
+    """
+    keys, days, matrix = daily
+    ads = matrix.mean(axis=1)
+    if undated_days:
+        ads = ads + keys["undated_units"].to_numpy() / undated_days
+
+    stats = keys[GROUP_COLS].copy()
+    stats["ads"] = ads
+    stats["ads_std"] = keys["dated_std"].to_numpy()
+    stats["ads_trend"] = keys["dated_trend"].to_numpy()
+    stats["has_dated"] = keys["has_dated"].to_numpy()
+    return stats
+
+def compile_stock_index(stock_df):
+    """
+    Lookup form of a stock file: one row per internal SKU (duplicate rows summed),
+    indexed by the SKU so plan rows resolve to stock rows with one hash lookup each.
+    """
+    codes, skus = pd.factorize(stock_df["internal_sku"])
+    on_hand = stock_df["stock_on_hand"].to_numpy(dtype=float)
+    on_order = stock_df["on_order"].to_numpy(dtype=float) if "on_order" in stock_df.columns else np.zeros(len(codes))
+    return pd.DataFrame({
+        "stock_on_hand": np.bincount(codes, weights=on_hand, minlength=len(skus)),
+        "on_order": np.bincount(codes, weights=on_order, minlength=len(skus))
+    }, index=pd.Index(skus, name="internal_sku"))
+
+def _allocate_stock(codes, gross, available):
+    """
+    Net requirement per row when several rows share one SKU's stock: rows are
+    served largest gross first, each using whatever stock the earlier rows of
+    that SKU left over. codes groups the rows; available is the SKU's stock on
+    every one of its rows. The nets of a SKU add up to max(total gross - stock, 0).
+    """
+    order = np.lexsort((-gross, codes))
+    sorted_gross = gross[order]
+    cum = np.cumsum(sorted_gross)
+    starts = np.r_[True, codes[order][1:] != codes[order][:-1]]
+    # Gross of the SKU's earlier rows, then through this row
+    before_sku = np.maximum.accumulate(np.where(starts, cum - sorted_gross, 0.0))
+    through = cum - before_sku
+    earlier = through - sorted_gross
+    stock = available[order]
+    net = np.empty_like(gross)
+    net[order] = np.clip(through - stock, 0, None) - np.clip(earlier - stock, 0, None)
+    return net
+
+def apply_stock(plan, stock):
+    """
+    Net requirement = gross requirement - stock on hand - stock on order, floored at 0.
+    The gross figure is kept as gross_qty; recommended_qty becomes the net.
+    Stock is per internal SKU, so when one internal SKU has several plan rows
+    (e.g. an orphan marketplace SKU equal to an internal SKU, or master rows
+    with differing supplier/category) it is netted once across them, largest
+    row first (see _allocate_stock); stock_on_hand / on_order show the SKU's totals.
+    Netting is done in float (fractional stock, e.g. 2.9 kg, is not truncated)
+    and both quantities are rounded once, at the end.
+    SKUs missing from the stock file are treated as having no stock.
+    """
+    stock = stock if stock.index.name == "internal_sku" else compile_stock_index(stock)
+    # Hash lookup of each plan row's internal SKU in the stock index
+    rows = stock.index.get_indexer(plan["internal_sku"])
+    found = rows >= 0
+    safe_rows = np.where(found, rows, 0)
+    on_hand = np.where(found, stock["stock_on_hand"].to_numpy(dtype=float)[safe_rows], 0.0)
+    on_order = np.where(found, stock["on_order"].to_numpy(dtype=float)[safe_rows], 0.0)
+    plan["stock_on_hand"] = on_hand.round(2)
+    plan["on_order"] = on_order.round(2)
+
+    gross = plan["recommended_qty"].to_numpy(dtype=float)
+    plan["gross_qty"] = gross.round().astype(int)
+    codes, _ = pd.factorize(plan["internal_sku"])
+    plan["recommended_qty"] = _allocate_stock(codes, gross, on_hand + on_order).round().astype(int)
+    # Keep the purchase quantity as the last column
+    return plan[[c for c in plan.columns if c != "recommended_qty"] + ["recommended_qty"]]
+
+def service_level_z(service_level):
+    """z-score for a cycle service level, e.g. 0.95 -> 1.645."""
+    return NormalDist().inv_cdf(service_level)
+
+def apply_reorder_params(demand, sales_days, purchase_days, lead_time, safety_stock_days, daily_stats=None, service_level=None, stock=None):
+    """
+    Cheap half of the planner: turns the aggregated demand table into a
+    purchase plan for the given sidebar parameters.
+    1. Calculates Daily Velocity (ADS)
+    2. Computes Reorder Point logic
+
+    If daily_stats (from daily_demand_stats) is given, ADS and its trend come
+    from the dated series and sales_days is ignored. If service_level is also
+    given, safety stock is statistical (z * sigma * sqrt(lead_time)) instead of
+    ADS * safety_stock_days; SKUs with no dated sales (sigma unknown) keep
+    ADS * safety_stock_days, and safety_basis says which rule each row used.
+    If stock (from load_stock_levels or compile_stock_index) is given,
+    recommended_qty is net of stock on hand and on order (see apply_stock).
+    """
+    plan = demand.copy()
+
     # 7. The Math
     # Average Daily Sales (ADS)
-    plan["ads"] = plan["total_sold_units"] / sales_days
+    if daily_stats is not None:
+        plan = plan.merge(daily_stats[GROUP_COLS + ["ads", "ads_std", "ads_trend", "has_dated"]], on=GROUP_COLS, how="left")
+        plan["ads"] = plan["ads"].fillna(0)
+        plan["ads_std"] = plan["ads_std"].fillna(0)
+        plan["ads_trend"] = plan["ads_trend"].fillna(0).round(3)
+        has_dated = plan.pop("has_dated").fillna(False).to_numpy(dtype=bool)
+    else:
+        plan["ads"] = plan["total_sold_units"] / sales_days
     
     # Lead Time Demand = ADS * Lead Time
     plan["lead_time_demand"] = plan["ads"] * lead_time
     
-    # Safety Stock = ADS * Safety Stock Days
-    plan["safety_stock"] = plan["ads"] * safety_stock_days
+    if service_level and daily_stats is not None:
+        # Safety Stock = z * sigma(dated daily demand) * sqrt(Lead Time);
+        # undated-only SKUs (e.g. Amazon summary) have no sigma, so they keep days of cover
+        statistical = service_level_z(service_level) * plan["ads_std"] * np.sqrt(lead_time)
+        plan["safety_stock"] = np.where(has_dated, statistical, plan["ads"] * safety_stock_days)
+        plan["safety_basis"] = np.where(has_dated, "Service level", "Days of cover")
+    else:
+        # Safety Stock = ADS * Safety Stock Days
+        plan["safety_stock"] = plan["ads"] * safety_stock_days
     
     # Cycle Stock (Demand for the period we are buying for)
     plan["cycle_stock"] = plan["ads"] * purchase_days
     
     # Gross Requirement (Simplified Reorder Formula)
     # Total Needed = Cycle Stock + Safety Stock + Lead Time Demand
-    plan["recommended_qty"] = (plan["cycle_stock"] + plan["safety_stock"] + plan["lead_time_demand"]).round().astype(int)
+    plan["recommended_qty"] = plan["cycle_stock"] + plan["safety_stock"] + plan["lead_time_demand"]
+    
+    # Net Requirement = Gross - On Hand - On Order (rounded once, after netting)
+    if stock is not None:
+        plan = apply_stock(plan, stock)
+    else:
+        plan["recommended_qty"] = plan["recommended_qty"].round().astype(int)
     
     # Cleanup for Display
     plan["ads"] = plan["ads"].round(2)
+    if "ads_std" in plan.columns:
+        plan["ads_std"] = plan["ads_std"].round(2)
     plan["total_sold_units"] = plan["total_sold_units"].astype(int)
+    for col in PLATFORM_UNIT_COLS:
+        if col in plan.columns:
+            plan[col] = plan[col].round().astype(int)
     
     # Sort by highest demand
     plan = plan.sort_values(by="recommended_qty", ascending=False)
     
+    return plan
+
+def generate_purchase_plan(amazon_df, flipkart_df, meesho_df, master_df, sales_days, purchase_days, lead_time, safety_stock_days, engine="codes", preaggregate=True):
+    """Full pipeline: aggregate_demand followed by apply_reorder_params."""
+    demand, orphans = aggregate_demand(amazon_df, flipkart_df, meesho_df, master_df, engine=engine, preaggregate=preaggregate)
+    if demand.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    plan = apply_reorder_params(demand, sales_days, purchase_days, lead_time, safety_stock_days)
     return plan, orphans
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""
+Headless purchase planner.
+
+    python -m src.plan --amazon BusinessReport.csv --flipkart Orders.xlsx --meesho Orders.csv --out plan.xlsx
+    python -m src.plan --reports downloads/*.csv downloads/*.xlsx --out plan.xlsx
+    python -m src.plan --batch nightly.json
+    python -m src.plan --reports new/*.csv --history-days 90    # add to the sales history, plan on it
+
+A batch file is a JSON list of report sets, each planned and written separately:
+    [{"name": "account-a", "amazon": ["a.csv"], "meesho": ["m1.csv", "m2.csv"], "out": "account_a.xlsx"}, ...]
+Files under "reports" (or --reports) are recognised from their header row. With
+--history-days each batch set keeps its own store (history_db suffixed with the set name);
+an optional "account" (like --account) names the seller account of the set's period summaries.
+
+Defaults come from config/settings.json. Only argparse/json are imported up front;
+pandas and the planner modules load once there is actually something to plan.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+PLATFORMS = ("amazon", "flipkart", "meesho")
+
+def load_settings(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def parse_args(argv, defaults):
+    parser = argparse.ArgumentParser(prog="python -m src.plan", description="Generate a purchase plan without the Streamlit UI.")
+    parser.add_argument("--config", default="config/settings.json", help="Settings file (default: %(default)s)")
+    parser.add_argument("--amazon", nargs="+", default=[], metavar="CSV", help="Amazon Business Report(s)")
+    parser.add_argument("--flipkart", nargs="+", default=[], metavar="XLSX", help="Flipkart Orders export(s)")
+    parser.add_argument("--meesho", nargs="+", default=[], metavar="CSV", help="Meesho Orders report(s)")
+    parser.add_argument("--reports", nargs="+", default=[], metavar="FILE",
+                        help="Reports of any platform (or a stock file), recognised from their header row")
+    parser.add_argument("--stock", metavar="FILE", help="Stock levels (CSV/XLSX); the plan becomes net of stock on hand and on order")
+    parser.add_argument("--batch", metavar="JSON", help="JSON list of report sets to plan in one run")
+    parser.add_argument("--out", help="Output .xlsx; bare file names go into file_paths.output_folder")
+    parser.add_argument("--sales-days", type=int, default=defaults.get("sales_period_days", 30),
+                        help="Days the undated reports (Amazon Business Report) cover; all reports with --no-infer")
+    parser.add_argument("--purchase-days", type=int, default=defaults.get("purchase_period_days", 15))
+    parser.add_argument("--lead-time", type=int, default=defaults.get("lead_time_days", 10))
+    parser.add_argument("--safety-days", type=int, default=defaults.get("safety_stock_days", 7))
+    parser.add_argument("--service-level", type=float, default=None,
+                        help="Use statistical safety stock at this service level (e.g. 0.95)")
+    parser.add_argument("--forecast", choices=["moving_average", "ses", "holt", "croston", "sba"], default=None,
+                        help="Forecast ADS instead of the flat average")
+    parser.add_argument("--history-days", type=int, default=None, metavar="DAYS",
+                        help="Save the reports to the sales history and plan on its last DAYS days")
+    parser.add_argument("--account", help="Seller account of the Amazon Business Reports saved with --history-days; "
+                                          "a newer report of the same account replaces the older one")
+    parser.add_argument("--no-infer", action="store_true", help="Use --sales-days even when order dates are present")
+    return parser.parse_args(argv)
+
+def output_path(out, output_folder, name=None):
+    """Bare file names are placed in the configured output folder."""
+    if not out:
+        suffix = f"_{name}" if name else ""
+        out = f"Purchase_Plan{suffix}_{datetime.now().strftime('%Y-%m-%d')}.xlsx"
+    if not os.path.dirname(out):
+        out = os.path.join(output_folder, out)
+    return out
+
+def history_path(db_path, name=None):
+    """Sales history file for one report set: batch sets each get their own store."""
+    if not name:
+        return db_path
+    root, ext = os.path.splitext(db_path)
+    return f"{root}_{name}{ext}"
+
+def plan_report_set(report_set, master_df, args, loader_opts, cache_opts, stock_df=None, history_db=None):
+    """
+    Parses one set of reports and returns (plan_df, orphans_df, errors).
+    With --history-days the set is added to history_db (default: the configured store).
+    """
+    import functools
+    from . import data_loaders, forecasting, ingestion, inventory_engine, upload_cache
+
+    sources = {platform: report_set.get(platform, []) for platform in PLATFORMS}
+    sources[None] = report_set.get("reports", [])
+    sources, errors = ingestion.route_sources(sources)
+    dropped_stock = sources.pop("stock", [])
+    if dropped_stock and stock_df is None:
+        stock_df, err = upload_cache.cached_load(data_loaders.load_stock_levels, dropped_stock[0], **cache_opts)
+        if err:
+            errors[dropped_stock[0]] = err
+            stock_df = None
+
+    options = {
+        "amazon": {"max_memory_mb": loader_opts.get("amazon_max_memory_mb")},
+        "flipkart": {"engine": loader_opts.get("flipkart_engine", "openpyxl")}
+    }
+    load_fn = functools.partial(upload_cache.cached_load, **cache_opts)
+    if args.history_days:
+        from . import history
+        conn = history.connect(history_db or args.history_db)
+        sync_errors, _ = history.ingest_sources(conn, sources, load_fn=load_fn, options=options,
+                                                account=report_set.get("account", args.account), period_days=args.sales_days)
+        frames = history.load_window(conn, days=args.history_days)
+        conn.close()
+    else:
+        ledger = ingestion.DemandLedger()
+        sync_errors, _ = ledger.sync(sources, options=options, load_fn=load_fn)
+        frames = ledger.frames()
+    errors.update(sync_errors)
+    demand_df, orphans_df = inventory_engine.aggregate_demand(*frames, master_df)
+    if demand_df.empty:
+        return demand_df, orphans_df, errors
+
+    # History summaries come back scaled to the window, so the window is the sales period
+    sales_days = args.history_days or args.sales_days
+    daily_stats = None
+    platform_daily = None if args.no_infer else inventory_engine.build_platform_daily(*frames, master_df)
+    if platform_daily is not None:
+        daily = inventory_engine.combine_platform_daily(platform_daily)
+        # Dated platforms use their own order-date span; undated summaries use --sales-days
+        daily_stats = inventory_engine.daily_demand_stats(daily, undated_days=sales_days)
+        if args.forecast:
+            daily_stats["ads"] = forecasting.forecast_ads(platform_daily, args.forecast, undated_days=sales_days)
+
+    plan_df = inventory_engine.apply_reorder_params(
+        demand_df, sales_days, args.purchase_days, args.lead_time, args.safety_days,
+        daily_stats=daily_stats, service_level=args.service_level, stock=stock_df
+    )
+    return plan_df, orphans_df, errors
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    # --config has to be known before the other defaults can be filled in
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--config", default="config/settings.json")
+    config = load_settings(pre.parse_known_args(argv)[0].config)
+    args = parse_args(argv, config.get("defaults", {}))
+
+    if args.batch:
+        with open(args.batch, "r") as f:
+            report_sets = json.load(f)
+    else:
+        report_sets = [{"amazon": args.amazon, "flipkart": args.flipkart, "meesho": args.meesho,
+                        "reports": args.reports, "out": args.out}]
+
+    if not args.history_days and not any(s.get(p) for s in report_sets for p in PLATFORMS + ("reports",)):
+        print("No reports given. Pass --amazon/--flipkart/--meesho/--reports or --batch.", file=sys.stderr)
+        return 2
+
+    from . import data_loaders, export, inventory_engine, upload_cache
+
+    paths = config.get("file_paths", {})
+    args.history_db = paths.get("history_db", "data/sales_history.sqlite")
+    loader_opts = config.get("loaders", {})
+    cache_opts = {
+        "cache_dir": paths.get("cache_folder", upload_cache.DEFAULT_CACHE_DIR),
+        "max_mb": loader_opts.get("cache_max_mb", upload_cache.DEFAULT_MAX_MB)
+    }
+    output_folder = paths.get("output_folder", "exports")
+
+    master_df, err = inventory_engine.load_master_index(paths.get("master_data", "config/master_product_list.csv"))
+    if err:
+        print(f"Error loading Master Data: {err}", file=sys.stderr)
+        return 1
+    duplicate_skus = inventory_engine.duplicate_master_skus(master_df)
+    if duplicate_skus:
+        print(f"Warning: {len(duplicate_skus)} marketplace SKU(s) listed more than once in the Master Data; "
+              f"only the first row of each is used: {', '.join(duplicate_skus[:10])}", file=sys.stderr)
+
+    # One stock file for the whole run: --stock, else the configured stock feed if present
+    stock_df = None
+    stock_path = args.stock or paths.get("stock_file")
+    if stock_path and (args.stock or os.path.exists(stock_path)):
+        stock_df, err = data_loaders.load_stock_levels(stock_path)
+        if err:
+            print(err, file=sys.stderr)
+            return 1
+        stock_df = inventory_engine.compile_stock_index(stock_df)
+
+    status = 0
+    for i, report_set in enumerate(report_sets):
+        name = report_set.get("name") or (f"set{i + 1}" if len(report_sets) > 1 else None)
+        # Batch sets are separate accounts/businesses: never mix them in one history store
+        set_history = history_path(args.history_db, name) if args.batch else None
+        plan_df, orphans_df, errors = plan_report_set(report_set, master_df, args, loader_opts, cache_opts, stock_df,
+                                                      history_db=set_history)
+        for file_name, file_err in errors.items():
+            print(f"{file_name}: {file_err}", file=sys.stderr)
+            status = 1
+
+        label = name or "plan"
+        if plan_df.empty:
+            print(f"[{label}] No valid sales data found.", file=sys.stderr)
+            status = 1
+            continue
+
+        out = output_path(report_set.get("out"), output_folder, name)
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        export.plan_to_excel(plan_df, orphans_df, out)
+        print(f"[{label}] {len(plan_df)} products, {plan_df['recommended_qty'].sum():,} units to buy "
+              f"({len(orphans_df)} unknown SKUs) -> {out}")
+        if "safety_basis" in plan_df.columns:
+            fallback = int((plan_df["safety_basis"] == "Days of cover").sum())
+            if fallback:
+                print(f"[{label}] {fallback} SKU(s) without dated sales use {args.safety_days} days of safety stock "
+                      "instead of the service level", file=sys.stderr)
+
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+from . import inventory_engine
+
+# matplotlib's 9-class "Greens", so the table looks like background_gradient(cmap='Greens')
+GREENS = ["#f7fcf5", "#e5f5e0", "#c7e9c0", "#a1d99b", "#74c476", "#41ab5d", "#238b45", "#006d2c", "#00441b"]
+
+# Same luminance cut-off pandas' Styler uses to switch to white text
+TEXT_COLOR_THRESHOLD = 0.408
+
+def _hex_to_rgb(colors):
+    return np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in colors], dtype=float) / 255
+
+def gradient_css(values, colors=GREENS):
+    """
+    CSS 'background-color/color' strings for a numeric column, computed for all
+    rows at once (linear colour ramp between min and max, no matplotlib).
+    """
+    values = np.asarray(values, dtype=float)
+    lo, hi = np.nanmin(values), np.nanmax(values)
+    t = (values - lo) / (hi - lo) if hi > lo else np.zeros_like(values)
+    t = np.nan_to_num(t)
+
+    anchors = _hex_to_rgb(colors)
+    stops = np.linspace(0, 1, len(colors))
+    rgb = np.column_stack([np.interp(t, stops, anchors[:, ch]) for ch in range(3)])
+
+    # Relative luminance (sRGB), as in pandas' Styler.background_gradient
+    linear = np.where(rgb <= 0.03928, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    luminance = linear @ np.array([0.2126, 0.7152, 0.0722])
+    text = np.where(luminance < TEXT_COLOR_THRESHOLD, "#f1f1f1", "#000000")
+
+    hexes = ["#{:02x}{:02x}{:02x}".format(*px) for px in np.round(rgb * 255).astype(int)]
+    return np.array([f"background-color: {bg}; color: {fg};" for bg, fg in zip(hexes, text)], dtype=object)
+
+class PlanIndex:
+    """
+    Group offsets over one plan, built once per plan content.
+
+    For each drill-down path (category -> supplier, supplier -> category) the
+    row positions are stably sorted by the path's columns, so every group and
+    every sub-group is a contiguous (start, stop) run; inside the innermost
+    group rows keep the plan's highest-quantity-first order. Filtering is then
+    a slice of the positions, and the KPI totals of every group come from one
+    cumulative sum. A platform filter narrows a slice to the rows that sold on
+    that platform, with its own cumulative sums for the KPIs.
+    """
+
+    def __init__(self, plan_df, paths=(("category", "supplier"), ("supplier", "category"))):
+        self.n_rows = len(plan_df)
+        self.order = {}    # first column of a path -> row positions sorted along the path
+        self.offsets = {}  # first column -> {key tuple: (start, stop)}, for each key prefix
+        self.totals = {}   # first column -> {platform or None: {kpi: cumulative sums over the sorted rows}}
+        self.children = {} # first column -> {key tuple: [next-level values]}
+
+        # platform -> rows with sales there (None = every row)
+        self.platform_rows = {None: np.ones(self.n_rows, dtype=bool)}
+        self.units_col = {None: "total_sold_units"}
+        for name, units_col in zip(inventory_engine.PLATFORMS, inventory_engine.PLATFORM_UNIT_COLS):
+            if units_col in plan_df.columns and (plan_df[units_col] > 0).any():
+                self.platform_rows[name] = plan_df[units_col].to_numpy() > 0
+                self.units_col[name] = units_col
+        self.platforms = [name for name in self.platform_rows if name]
+
+        for path in paths:
+            self._index_path(plan_df, list(path))
+
+    def _index_path(self, plan_df, path):
+        codes = [pd.factorize(plan_df[col], sort=True)[0] for col in path]
+        # lexsort sorts by its last key first and is stable
+        order = np.lexsort(codes[::-1])
+        head = path[0]
+        self.order[head] = order
+
+        offsets, children = {}, {(): []}
+        changed = np.zeros(len(order), dtype=bool)
+        for depth, col in enumerate(path):
+            sorted_codes = codes[depth][order]
+            changed[1:] |= sorted_codes[1:] != sorted_codes[:-1]
+            if len(order):
+                changed[0] = True
+            starts = np.flatnonzero(changed)
+            stops = np.append(starts[1:], len(order))
+            values = plan_df[path[:depth + 1]].to_numpy()[order[starts]]
+            for key, start, stop in zip(map(tuple, values), starts, stops):
+                offsets[key] = (int(start), int(stop))
+                children.setdefault(key[:-1], []).append(key[-1])
+        self.offsets[head] = offsets
+        self.children[head] = children
+
+        recommended = plan_df["recommended_qty"].to_numpy()[order]
+        self.totals[head] = {}
+        for platform, rows in self.platform_rows.items():
+            keep = rows[order]
+            kpi_values = {
+                "total_sold_units": plan_df[self.units_col[platform]].to_numpy()[order] * keep,
+                "recommended_qty": recommended * keep,
+                "products": keep.astype(int)
+            }
+            self.totals[head][platform] = {
+                kpi: np.concatenate([[0], np.cumsum(values)]) for kpi, values in kpi_values.items()
+            }
+
+    def groups(self, head, key=(), platform=None):
+        """Values one level below key on the path starting at head (e.g. suppliers of a category)."""
+        key = tuple(key)
+        values = self.children[head].get(key, [])
+        if platform:
+            values = [v for v in values if self.kpis(head, key + (v,), platform)["products"] > 0]
+        return values
+
+    def bounds(self, head, key=()):
+        key = tuple(key)
+        return self.offsets[head][key] if key else (0, self.n_rows)
+
+    def positions(self, head, key=(), platform=None):
+        """Row positions (into the plan) of a group, grouped by the next level down."""
+        start, stop = self.bounds(head, key)
+        positions = self.order[head][start:stop]
+        if platform:
+            positions = positions[self.platform_rows[platform][positions]]
+        return positions
+
+    def kpis(self, head, key=(), platform=None):
+        """
+        {kpi: total} for a group, read off the precomputed cumulative sums.
+        With a platform, units sold are that platform's units only, while
+        recommended_qty stays the whole-SKU purchase (stock isn't bought per platform).
+        """
+        start, stop = self.bounds(head, key)
+        return {kpi: sums[stop] - sums[start] for kpi, sums in self.totals[head][platform].items()}
+
+def page_bounds(n_rows, page, page_size):
+    """(start, stop) of a 1-based page, clamped to the data."""
+    n_pages = max(1, -(-n_rows // page_size))
+    page = min(max(1, page), n_pages)
+    start = (page - 1) * page_size
+    return start, min(start + page_size, n_rows)
+
+def style_page(page_df, css, column="recommended_qty"):
+    """Styler for one page only, using colours precomputed by gradient_css."""
+    col_idx = page_df.columns.get_loc(column)
+
+    def _apply(frame):
+        styles = np.full(frame.shape, "", dtype=object)
+        styles[:, col_idx] = css
+        return styles
+
+    return page_df.style.apply(_apply, axis=None)
@@ -0,0 +1,223 @@
+"""
+Column schemas for every report the planner reads.
+
+Each report has one or more variants (header layouts), tried in order. A variant
+maps our field names to the report's header text and the dtype to read it as:
+
+    "fields": {field: (header name or tuple of accepted names, dtype)}
+
+Header names are compared stripped and case-insensitively. Fields listed in
+"optional" may be missing; every other field is required. The variant is picked
+from the header row alone, and only the mapped columns are then parsed.
+"""
+import os
+import zipfile
+
+import pandas as pd
+
+SCHEMAS = {
+    "amazon": [
+        {
+            "variant": "business_report",
+            "label": "Amazon Business Report",
+            # Units can carry thousands separators ("1,234"), so they are cleaned as text
+            "fields": {
+                "sku": ("SKU", "str"),
+                "qty": ("Units Ordered", "str")
+            }
+        }
+    ],
+    "flipkart": [
+        {
+            "variant": "orders",
+            "label": "Flipkart Orders export",
+            "sheet": "Orders",
+            "fields": {
+                "sku": ("sku", "str"),
+                "qty": ("quantity", "str"),
+                "status": ("order_item_status", "str"),
+                "date": ("order_date", "str"),
+                "order_id": ("order_item_id", "str")
+            },
+            "optional": ["date", "order_id"]
+        }
+    ],
+    "meesho": [
+        {
+            "variant": "orders",
+            "label": "Meesho Orders report",
+            "fields": {
+                "sku": ("SKU", "str"),
+                "qty": ("Quantity", "str"),
+                "date": ("Order Date", "str"),
+                "order_id": ("Sub Order No", "str")
+            },
+            "optional": ["date", "order_id"]
+        }
+    ],
+    "stock": [
+        {
+            "variant": "stock_levels",
+            "label": "Stock file",
+            "fields": {
+                "internal_sku": (("internal_sku", "sku", "item sku", "seller sku"), "str"),
+                "stock_on_hand": (("stock_on_hand", "stock", "qty", "stock qty", "on hand", "available"), "str"),
+                "on_order": (("on_order", "on order", "incoming", "in transit", "ordered qty"), "str")
+            },
+            "optional": ["on_order"]
+        }
+    ]
+}
+
+# File formats each report comes in; also the order sniff_report tries them
+# (marketplace reports first, the free-form stock file last)
+REPORT_FORMATS = {
+    "flipkart": ("xlsx",),
+    "amazon": ("csv",),
+    "meesho": ("csv",),
+    "stock": ("csv", "xlsx")
+}
+
+def _normalize(name):
+    # Excel/CSV exports sometimes lead with a UTF-8 BOM
+    return str(name).lstrip("\ufeff").strip().casefold()
+
+def _names(spec):
+    names, _ = spec
+    return (names,) if isinstance(names, str) else names
+
+def _match(variant, header):
+    """({field: raw header name} for the fields found, [missing required fields])."""
+    lookup = {}
+    for raw in header:
+        lookup.setdefault(_normalize(raw), raw)
+
+    columns, missing = {}, []
+    for field, spec in variant["fields"].items():
+        raw = next((lookup[_normalize(n)] for n in _names(spec) if _normalize(n) in lookup), None)
+        if raw is not None:
+            columns[field] = raw
+        elif field not in variant.get("optional", []):
+            missing.append(field)
+    return columns, missing
+
+def detect_variant(report, header):
+    """
+    Picks the first variant of `report` whose required columns are all in `header`.
+    Returns (variant, {field: raw header name}); raises ValueError naming the
+    missing columns of the closest variant if none fits.
+    """
+    best = None
+    for variant in SCHEMAS[report]:
+        columns, missing = _match(variant, header)
+        if not missing:
+            return variant, columns
+        if best is None or len(missing) < len(best[1]):
+            best = (variant, missing)
+
+    variant, missing = best
+    expected = ", ".join(f"'{_names(variant['fields'][f])[0]}'" for f in missing)
+    raise ValueError(f"doesn't match the {variant['label']} layout: missing column(s) {expected}")
+
+def dtypes(variant, columns):
+    """read_csv / read_excel dtype mapping for the matched raw columns."""
+    return {raw: variant["fields"][field][1] for field, raw in columns.items()}
+
+def _rewind(uploaded_file):
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+
+def csv_header(uploaded_file):
+    """Column names of a CSV from its header line only (the file is rewound before and after)."""
+    _rewind(uploaded_file)
+    header = pd.read_csv(uploaded_file, nrows=0).columns.tolist()
+    _rewind(uploaded_file)
+    return header
+
+def read_csv_report(uploaded_file, report, **read_kwargs):
+    """
+    Reads just the schema's columns of a CSV report, renamed to field names.
+    With chunksize in read_kwargs, returns an iterator of renamed chunks.
+    Returns (df or iterator, variant).
+    """
+    variant, columns = detect_variant(report, csv_header(uploaded_file))
+    rename = {raw: field for field, raw in columns.items()}
+    data = pd.read_csv(uploaded_file, usecols=list(rename), dtype=dtypes(variant, columns), **read_kwargs)
+    if "chunksize" in read_kwargs:
+        return (chunk.rename(columns=rename) for chunk in data), variant
+    return data.rename(columns=rename), variant
+
+def read_xlsx_report(uploaded_file, report, engine="openpyxl"):
+    """
+    Reads just the schema's columns of one worksheet, renamed to field names.
+    The header is read straight from the sheet XML, so variant detection never
+    loads the workbook. engine="stream" also reads the body with xlsx_reader
+    (values as strings); any other engine goes through pandas.read_excel.
+    Returns (df, variant).
+    """
+    from .xlsx_reader import read_sheet_columns, read_sheet_header
+
+    sheets = [v.get("sheet") for v in SCHEMAS[report]]
+    sheet = sheets[0] if len(set(sheets)) == 1 else None
+    try:
+        header = read_sheet_header(uploaded_file, sheet)
+    except zipfile.BadZipFile:
+        raise ValueError("not an .xlsx workbook")
+    variant, columns = detect_variant(report, header)
+    _rewind(uploaded_file)
+    rename = {raw: field for field, raw in columns.items()}
+
+    if engine == "stream":
+        df = read_sheet_columns(uploaded_file, sheet, [raw.strip() for raw in rename])
+        df.columns = list(rename)
+    else:
+        df = pd.read_excel(uploaded_file, sheet_name=sheet or 0, engine=engine,
+                           usecols=list(rename), dtype=dtypes(variant, columns))
+    return df.rename(columns=rename), variant
+
+def _is_xlsx(uploaded_file):
+    """True if the file starts with the zip magic bytes (only 4 bytes are read)."""
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, "rb") as f:
+            magic = f.read(4)
+    else:
+        _rewind(uploaded_file)
+        magic = uploaded_file.read(4)
+        _rewind(uploaded_file)
+    return magic.startswith(b"PK")
+
+def sniff_report(uploaded_file):
+    """
+    Classifies a report without parsing its body: an .xlsx by the sheet list in
+    workbook.xml plus the header row of the matching sheet, a CSV by its header
+    line. Returns the SCHEMAS key ('amazon', 'flipkart', 'meesho' or 'stock'),
+    or None if no layout fits.
+    """
+    try:
+        if _is_xlsx(uploaded_file):
+            from .xlsx_reader import read_sheet_header, sheet_names
+            sheets = sheet_names(uploaded_file)
+            headers = {}  # sheet name -> header row, each read at most once
+            for report, formats in REPORT_FORMATS.items():
+                if "xlsx" not in formats:
+                    continue
+                for variant in SCHEMAS[report]:
+                    sheet = variant.get("sheet") or (sheets[0] if sheets else None)
+                    if sheet not in sheets:
+                        continue
+                    if sheet not in headers:
+                        headers[sheet] = read_sheet_header(uploaded_file, sheet)
+                    if not _match(variant, headers[sheet])[1]:
+                        return report
+        else:
+            header = csv_header(uploaded_file)
+            for report, formats in REPORT_FORMATS.items():
+                if "csv" in formats and any(not _match(v, header)[1] for v in SCHEMAS[report]):
+                    return report
+    except Exception:
+        # Unreadable or not a spreadsheet at all: nothing we can route
+        return None
+    finally:
+        if not isinstance(uploaded_file, (str, os.PathLike)):
+            _rewind(uploaded_file)
+    return None
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import tempfile
+
+from .data_loaders import LOADER_VERSION
+
+DEFAULT_CACHE_DIR = "cache/uploads"
+DEFAULT_MAX_MB = 256
+
+def read_upload_bytes(uploaded_file):
+    """Returns the raw bytes of a Streamlit upload, file object or path, leaving file objects rewound."""
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, "rb") as f:
+            return f.read()
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    uploaded_file.seek(0)
+    data = uploaded_file.read()
+    uploaded_file.seek(0)
+    return data
+
+def _feather():
+    """pyarrow's Feather module, imported on first use (None if pyarrow is missing)."""
+    try:
+        from pyarrow import feather
+        return feather
+    except ImportError:
+        return None
+
+def cache_key(data, loader, **loader_kwargs):
+    """Content hash of the upload plus everything that can change the parsed result."""
+    h = hashlib.sha256(data)
+    h.update(f"|{loader.__name__}|{LOADER_VERSION}|{sorted(loader_kwargs.items())}".encode())
+    return h.hexdigest()
+
+def _evict(cache_dir, max_bytes):
+    """Deletes least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".feather"):
+            path = os.path.join(cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+def cached_load(loader, uploaded_file, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_MAX_MB, **loader_kwargs):
+    """
+    Runs a data_loaders function through an on-disk parse cache.
+
+    Entries are keyed by the SHA-256 of the uploaded bytes + loader name/version/options
+    and stored as Feather files, so a rerun with the same report is a hash plus a
+    memory-mapped read. Falls back to a plain parse if pyarrow is not installed.
+    Returns the loader's usual (df, err) tuple; errors are never cached.
+    """
+    feather = _feather()
+    if feather is None:
+        return loader(uploaded_file, **loader_kwargs)
+
+    key = cache_key(read_upload_bytes(uploaded_file), loader, **loader_kwargs)
+    path = os.path.join(cache_dir, f"{key}.feather")
+
+    if os.path.exists(path):
+        try:
+            df = feather.read_table(path, memory_map=True).to_pandas()
+            os.utime(path)  # mark as recently used for LRU eviction
+            return df, None
+        except Exception:
+            # Corrupt or half-written entry: drop it and parse again
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    df, err = loader(uploaded_file, **loader_kwargs)
+    if err or df is None:
+        return df, err
+
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        os.close(fd)
+        feather.write_feather(df.reset_index(drop=True), tmp_path)
+        os.replace(tmp_path, path)
+        _evict(cache_dir, max_mb * 1024 * 1024)
+    except Exception:
+        # The cache is an optimisation only; a failed write must not fail the upload
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return df, err
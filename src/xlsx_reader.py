@@ -0,0 +1,190 @@
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# SpreadsheetML namespaces used by the marketplace exports
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_COL_RE = re.compile(r"[A-Z]+")
+
+# Built-in number formats that display a date and/or time
+_DATE_FMT_IDS = set(range(14, 23)) | {45, 46, 47}
+# Quoted literals, escaped characters and [colour]/[$-locale] blocks aren't date tokens
+_FMT_LITERAL_RE = re.compile(r'"[^"]*"|\\.|\[[^\]]*\]')
+_EPOCH = datetime(1899, 12, 30)
+_EPOCH_1904 = datetime(1904, 1, 1)
+
+def _col_letters(cell_ref):
+    """'AB12' -> 'AB'"""
+    match = _COL_RE.match(cell_ref)
+    return match.group(0) if match else ""
+
+def _sheets(zf):
+    """[(sheet name, relationship id)] in workbook order, from workbook.xml alone."""
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    return [(sheet.get("name"), sheet.get(f"{NS_REL}id")) for sheet in workbook.iter(f"{NS_MAIN}sheet")]
+
+def _sheet_path(zf, sheet_name=None):
+    """Resolves a sheet name (None = first sheet) to its XML part via workbook.xml and its rels."""
+    sheets = _sheets(zf)
+    if sheet_name is None and sheets:
+        sheet_name = sheets[0][0]
+    rel_id = dict(sheets).get(sheet_name)
+    if rel_id is None:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{NS_PKG_REL}Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    raise ValueError(f"Worksheet '{sheet_name}' has no relationship target")
+
+def _shared_strings(zf, limit=None):
+    """
+    Loads sharedStrings.xml into a list (empty if the workbook has none).
+    With limit, stops after the first `limit` strings.
+    """
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    strings = []
+    for _, elem in ET.iterparse(zf.open("xl/sharedStrings.xml"), events=("end",)):
+        if elem.tag == f"{NS_MAIN}si":
+            # Rich text is split over several <t> runs; join them back up
+            strings.append("".join(t.text or "" for t in elem.iter(f"{NS_MAIN}t")))
+            elem.clear()
+            if limit is not None and len(strings) >= limit:
+                break
+    return strings
+
+def _is_date_format(code):
+    return any(ch in "dmyhs" for ch in _FMT_LITERAL_RE.sub("", code).lower())
+
+def _date_styles(zf):
+    """Indexes into cellXfs (a cell's s="...") whose number format shows a date."""
+    if "xl/styles.xml" not in zf.namelist():
+        return set()
+    styles = ET.fromstring(zf.read("xl/styles.xml"))
+    custom = {
+        int(fmt.get("numFmtId")) for fmt in styles.iter(f"{NS_MAIN}numFmt")
+        if _is_date_format(fmt.get("formatCode", ""))
+    }
+    cell_xfs = styles.find(f"{NS_MAIN}cellXfs")
+    if cell_xfs is None:
+        return set()
+    return {
+        i for i, xf in enumerate(cell_xfs.iter(f"{NS_MAIN}xf"))
+        if int(xf.get("numFmtId", 0)) in _DATE_FMT_IDS | custom
+    }
+
+def _epoch(zf):
+    """Day zero of the workbook's serial dates (1904 system for old Mac workbooks)."""
+    pr = ET.fromstring(zf.read("xl/workbook.xml")).find(f"{NS_MAIN}workbookPr")
+    return _EPOCH_1904 if pr is not None and pr.get("date1904") in ("1", "true") else _EPOCH
+
+def _serial_to_iso(value, epoch):
+    """Excel serial day number -> ISO timestamp text (the value unchanged if it isn't a number)."""
+    try:
+        stamp = epoch + timedelta(days=float(value))
+    except (TypeError, ValueError, OverflowError):
+        return value
+    return stamp.replace(microsecond=0).isoformat(sep=" ")
+
+def _cell_value(cell, shared):
+    """Raw cell text; empty strings come back as None, like pandas' read_excel NaN."""
+    cell_type = cell.get("t")
+    if cell_type == "inlineStr":
+        return "".join(t.text or "" for t in cell.iter(f"{NS_MAIN}t")) or None
+    v = cell.find(f"{NS_MAIN}v")
+    if v is None or v.text is None:
+        return None
+    if cell_type == "s":
+        return shared[int(v.text)] or None
+    return v.text
+
+def sheet_names(uploaded_file):
+    """Worksheet names of an .xlsx, read from workbook.xml without touching any sheet."""
+    with zipfile.ZipFile(uploaded_file) as zf:
+        return [name for name, _ in _sheets(zf)]
+
+def read_sheet_header(uploaded_file, sheet_name=None):
+    """
+    The first row of a worksheet (None = first sheet) as a list of strings.
+    Parsing stops at the end of that row, so the body is never read.
+    """
+    with zipfile.ZipFile(uploaded_file) as zf:
+        sheet_path = _sheet_path(zf, sheet_name)
+        for _, elem in ET.iterparse(zf.open(sheet_path), events=("end",)):
+            if elem.tag != f"{NS_MAIN}row":
+                continue
+            cells = list(elem.iter(f"{NS_MAIN}c"))
+            # Header strings are normally the first shared strings; only read as far as needed
+            indexes = [int(c.find(f"{NS_MAIN}v").text) for c in cells
+                       if c.get("t") == "s" and c.find(f"{NS_MAIN}v") is not None]
+            shared = _shared_strings(zf, limit=max(indexes) + 1) if indexes else []
+            values = (_cell_value(cell, shared) for cell in cells)
+            return [str(v) for v in values if v is not None]
+    return []
+
+def read_sheet_columns(uploaded_file, sheet_name, columns):
+    """
+    Streams one worksheet of an .xlsx and returns only the requested columns.
+
+    The first row is treated as the header. Values come back as strings (or None
+    for empty cells); callers are expected to coerce types themselves. Numbers in
+    date-formatted cells are stored as serial day counts; those come back as ISO
+    timestamps, as read_excel would give them.
+    Other sheets in the workbook are never opened.
+    """
+    wanted = set(columns)
+    with zipfile.ZipFile(uploaded_file) as zf:
+        sheet_path = _sheet_path(zf, sheet_name)
+        shared = _shared_strings(zf)
+        date_styles = _date_styles(zf)
+        epoch = _epoch(zf)
+
+        letter_to_col = None
+        data = {c: [] for c in columns}
+
+        for _, elem in ET.iterparse(zf.open(sheet_path), events=("end",)):
+            if elem.tag != f"{NS_MAIN}row":
+                continue
+
+            values = {}
+            for cell in elem.iter(f"{NS_MAIN}c"):
+                letters = _col_letters(cell.get("r", ""))
+                if letter_to_col is None or letters in letter_to_col:
+                    value = _cell_value(cell, shared)
+                    if (value is not None and cell.get("t", "n") == "n"
+                            and letter_to_col is not None and int(cell.get("s", 0)) in date_styles):
+                        value = _serial_to_iso(value, epoch)
+                    values[letters] = value
+            elem.clear()
+
+            if letter_to_col is None:
+                # Header row: remember which column letters we care about
+                letter_to_col = {
+                    letters: str(name).strip()
+                    for letters, name in values.items()
+                    if name is not None and str(name).strip() in wanted
+                }
+                missing = wanted - set(letter_to_col.values())
+                if missing:
+                    raise ValueError(f"Sheet '{sheet_name}' missing columns: {sorted(missing)}")
+                continue
+
+            if not values:
+                continue
+            found = {col: values.get(letters) for letters, col in letter_to_col.items()}
+            for col in columns:
+                data[col].append(found.get(col))
+
+    return pd.DataFrame(data, columns=list(columns))